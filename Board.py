@@ -2,6 +2,8 @@ import numbers
 import itertools
 from collections import namedtuple
 from collections import UserDict
+from types import MappingProxyType
+from typing import Dict
 
 import Settings
 
@@ -99,15 +101,19 @@ class Board(UserDict):
 
     lines_values = namedtuple('lines_values', ['total', 'consec', 'total_opp', 'consec_opp'])
 
+    # read-only lines of each position, shared by the cells of all boards
+    CELL_LINES: Dict[str, MappingProxyType] = {}
+
     def __init__(self):
         self.data = {}
         for l in range(1, 5):
             for r in range(1, 5):
                 for c in range(1, 5):
                     position = str(l) + str(r) + str(c)
-                    lines = {key: line for key, line in self.LINES.items() 
-                             if position in line}       
-                    self[position] = Cell(position, lines)
+                    if position not in self.CELL_LINES:
+                        self.CELL_LINES[position] = MappingProxyType(
+                            {key: line for key, line in self.LINES.items() if position in line})
+                    self[position] = Cell(position, self.CELL_LINES[position])
    
     # ensure all cells positions are strings
     def __setitem__(self, position, cell):
@@ -130,6 +136,12 @@ class Board(UserDict):
         for position, _ in self.items():
             self[position].set_as_empty()
 
+    def copy(self):
+        # new cells share the lines of these cells, so only values are copied
+        board = Board.__new__(type(self))
+        board.data = {position: cell.copy() for position, cell in self.data.items()}
+        return board
+
     def cells_rlc(self):
         for r in range(1, 5):
             for l in range(1, 5):
@@ -195,6 +207,8 @@ class Board(UserDict):
 
 class Cell:
 
+    __slots__ = ('position', '_value', 'lines')
+
     X = 'X'
     O = 'O'
     EMPTY = None
@@ -204,6 +218,13 @@ class Cell:
         self.set_as_empty()
         self.lines = lines
 
+    def copy(self):
+        cell = Cell.__new__(Cell)
+        cell.position = self.position
+        cell._value = self._value
+        cell.lines = self.lines
+        return cell
+
     @property
     def level(self):
         return int(self.position[0])
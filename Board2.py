@@ -1,9 +1,10 @@
 import numpy as np #type: ignore
 
-from sys import getsizeof
-from typing import NamedTuple
+from functools import lru_cache
+from typing import NamedTuple, Set, Tuple, Union, Mapping
 from pprint import pprint
 
+import boardio
 import hypercube as hc
 
 
@@ -18,7 +19,9 @@ class TicTacToe():
             self.d = d
             self.n = n
             
-            struct = hc.structure(d, n)
+            # the lines and scopes are shared with other instances of 
+            # the same size; only the board belongs to this instance
+            struct = hc.cached_structure(d, n)
             self.board = struct[0]
             self.lines = struct[1]
             self.num_lines = len(self.lines)
@@ -31,13 +34,456 @@ class TicTacToe():
         self.board.fill(0)
 
     def memory(self) -> Memory:
-        m = self.board.nbytes, getsizeof(self.lines), getsizeof(self.scopes)
+        m = self.board.nbytes, self.lines.nbytes, \
+            self.scopes.indptr.nbytes + self.scopes.indices.nbytes
         return self.Memory(*m, sum(m))
 
 
 
 
 
+ZOBRIST_SEED = 3
+
+@lru_cache(maxsize = None)
+def zobrist_table(d: int, n: int) -> np.ndarray:
+    """ Returns the random 64-bit Zobrist keys of the cells of h(d, n).
+
+    Element [cell, player - 1] of the returned (n^d, 2) uint64 array is
+    the key of `player` (1 for X, 2 for O) having a stone on `cell`. The
+    key of a board is the XOR of the keys of its stones. The keys are 
+    generated from ZOBRIST_SEED, d and n, so they are the same in every 
+    process.
+
+    Examples
+    --------
+    >>> table = zobrist_table(3, 4)
+    >>> table.shape, table.dtype
+    ((64, 2), dtype('uint64'))
+    >>> np.array_equal(table, zobrist_table.__wrapped__(3, 4))
+    True
+    """
+
+    rng = np.random.default_rng([ZOBRIST_SEED, d, n])
+    table = rng.integers(0, 2 ** 64, size = (n ** d, 2), dtype = np.uint64)
+    table.flags.writeable = False
+    return table
+
+
+def heuristics_table(heuristics: Mapping[str, float], n: int) -> np.ndarray:
+    """ Returns the weight of playing in a line, by the stones in the line.
+
+    Element [own, opp] of the returned (n + 1, n + 1) array is the weight
+    of a move in a line that already has `own` stones of the player and 
+    `opp` stones of the opponent. With keys as in Settings.heuristics:
+    Wi is the weight of making i in a line the opponent has not played, 
+    and Si the weight of stopping the opponent making i in a line the 
+    player has not played. A line both have played in has weight 0.
+
+    Examples
+    --------
+    >>> import Settings
+    >>> heuristics = Settings.Settings.as_heuristics(3).heuristics
+    >>> heuristics_table(heuristics, 3).tolist()
+    [[1.0, 2.0, 8.0, 0.0], [4.0, 0.0, 0.0, 0.0], [16.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]]
+    """
+
+    table = np.zeros((n + 1, n + 1))
+    for i in range(1, n + 1):
+        table[i - 1, 0] = heuristics['W' + str(i)]
+    for i in range(2, n + 1):
+        table[0, i - 1] = heuristics['S' + str(i)]
+    return table
+
+
+def _as_table(heuristics: Union[Mapping[str, float], np.ndarray], n: int) -> np.ndarray:
+    # heuristics as a heuristics_table, if they are not one already
+    if isinstance(heuristics, np.ndarray):
+        return heuristics
+    return heuristics_table(heuristics, n)
+
+
+class ArrayBoard():
+    """ A board of a celled hypercube h(d, n), stored as an int8 array.
+
+    Cells are identified by their flat index, 0 to n^d - 1. For boards
+    with n <= 9, a cell can also be given as a position string of 1-based
+    coordinates, as used by Board.Board; e.g. '111' or '234'.
+
+    The lines and scopes are the line table and scope index shared by all
+    boards of the same size through hypercube.cached_structure, and the 
+    classes of the cells (corners, faces, ...) are those of 
+    hypercube.get_cell_classes.
+
+    The number of Xs and Os in each line are kept in x_count and o_count,
+    and are updated in O(scope) on each change of a cell. The Zobrist key
+    of the board, key, is updated in O(1).
+
+    Each move reports whether it completed a line. The number of completed
+    lines of each player, and the threats of each player (open lines with
+    n - 1 of the player's stones and none of the opponent's), are also 
+    updated in O(scope).
+
+    Examples
+    --------
+    >>> board = ArrayBoard(3, 4)
+    >>> board.set_as_X(0)
+    False
+    >>> board.set_as_O('112')
+    False
+    >>> board[0], board[1], board['113']
+    (1, 2, 0)
+    >>> board.position(21), board.cell('222')
+    ('222', 21)
+    >>> board.line_values(0).tolist()
+    [[1, 0, 0, 0], [1, 0, 0, 0], [1, 2, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0]]
+
+    >>> empty = board.empty_cells()
+    >>> empty[board.classes.edges[empty] == board.d].tolist()
+    [3, 12, 15, 48, 51, 60, 63]
+    >>> info = board.lines_info(0)
+    >>> info.total.tolist(), info.total_opp.tolist()
+    ([1, 1, 1, 1, 1, 1, 1], [0, 0, 1, 0, 0, 0, 0])
+    >>> board.set_as_X('112')
+    False
+    >>> int(board.x_count.sum()), int(board.o_count.sum())
+    (11, 0)
+
+    >>> import Settings
+    >>> heuristics = Settings.Settings.as_heuristics(4).heuristics
+    >>> scores = board.score_moves(board.O, heuristics)
+    >>> int(scores.argmax()), float(scores.max())
+    (3, 14.0)
+
+    >>> other = board.copy()
+    >>> other.set_as_O(63)
+    False
+    >>> board[63], other[63], other.lines is board.lines
+    (0, 2, True)
+
+    >>> data = board.to_bytes()
+    >>> len(data)
+    16
+    >>> ArrayBoard.from_bytes(data).key == board.key
+    True
+    >>> ArrayBoard.from_bytes(data, 2, 3)
+    Traceback (most recent call last):
+    ...
+    ValueError: A board of h(2, 3) is 3 bytes, not 16
+
+    The key depends only on the position, not the order of the moves
+    >>> board.key == other.key
+    False
+    >>> other.set_as_empty(63)
+    False
+    >>> board.key == other.key
+    True
+    >>> board.key == board.zobrist_key()
+    True
+
+    >>> game = ArrayBoard(2, 3)
+    >>> game.set_as_X(0), game.set_as_X(1), game.set_as_O(4)
+    (False, False, False)
+    >>> sorted(game.threats[0]), game.threat_cells(game.X).tolist()
+    ([3], [2])
+    >>> game.set_as_X(2), game.winner
+    (True, 1)
+    >>> game.set_as_empty(2), game.winner
+    (False, 0)
+
+    The lines are those of Board.Board
+    >>> import Board
+    >>> lines = [sorted(board.position(cell) for cell in line) for line in board.lines]
+    >>> sorted(lines) == sorted(Board.Board.LINES.values())
+    True
+    """
+
+    EMPTY = 0
+    X = 1
+    O = 2
+
+    LinesInfo = NamedTuple('LinesInfo', [('lines', np.ndarray), ('total', np.ndarray), 
+                                         ('total_opp', np.ndarray)])
+
+    def __init__(self, d: int = 3, n: int = 4) -> None:
+        self.d = d
+        self.n = n
+        _, self.lines, self.scopes = hc.cached_structure(d, n)
+        self.classes = hc.get_cell_classes(d, n)
+        self.cells = np.zeros(n ** d, dtype = np.int8)
+        # counts[0] is the number of Xs and counts[1] the number of Os in each line
+        self.counts = np.zeros((2, len(self.lines)), dtype = np.int32)
+        self.x_count = self.counts[0]
+        self.o_count = self.counts[1]
+        self.zobrist = zobrist_table(d, n)
+        self.key = 0
+        # the number of completed lines, and the sets of threat lines, 
+        # of X (element 0) and O (element 1)
+        self.completed = [0, 0]
+        self.threats: Tuple[Set[int], Set[int]] = (set(), set())
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.d}, {self.n})'
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __getitem__(self, cell: Union[int, str]) -> int:
+        return int(self.cells[self.cell(cell)])
+
+    def cell(self, cell: Union[int, str]) -> int:
+        # convert a position string such as '111' to a flat index
+        if isinstance(cell, str):
+            coords = [int(x) - 1 for x in cell]
+            return int(np.ravel_multi_index(coords, [self.n] * self.d))
+        return cell
+
+    def position(self, cell: int) -> str:
+        return ''.join(str(x + 1) for x in np.unravel_index(cell, [self.n] * self.d))
+
+    def clear(self) -> None:
+        self.cells.fill(self.EMPTY)
+        self.counts.fill(0)
+        self.key = 0
+        self.completed = [0, 0]
+        self.threats = (set(), set())
+
+    def copy(self) -> 'ArrayBoard':
+        # the copy shares the read-only lines and scopes of this board
+        board = ArrayBoard.__new__(type(self))
+        board.__dict__.update(self.__dict__)
+        board.cells = self.cells.copy()
+        board.counts = self.counts.copy()
+        board.x_count = board.counts[0]
+        board.o_count = board.counts[1]
+        board.completed = self.completed.copy()
+        board.threats = (self.threats[0].copy(), self.threats[1].copy())
+        return board
+
+    def to_bytes(self) -> bytes:
+        # the cells packed with 2 bits per cell, as in boardio
+        return boardio.pack_boards(self.cells).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, d: int = 3, n: int = 4) -> 'ArrayBoard':
+        if len(data) != boardio.packed_size(n ** d):
+            raise ValueError(f"A board of h({d}, {n}) is {boardio.packed_size(n ** d)} "
+                             f"bytes, not {len(data)}")
+        board = cls(d, n)
+        cells = boardio.unpack_boards(np.frombuffer(data, dtype = np.uint8), n ** d)
+        if cells.max(initial = 0) > board.O:
+            raise ValueError("Cell values must be 0, 1 or 2")
+        for cell in np.flatnonzero(cells):
+            board.set(int(cell), cells[cell])
+        return board
+
+    def is_empty(self, cell: Union[int, str]) -> bool:
+        return bool(self.cells[self.cell(cell)] == self.EMPTY)
+
+    def empty_cells(self) -> np.ndarray:
+        return np.flatnonzero(self.cells == self.EMPTY)
+
+    def set_as_X(self, cell: Union[int, str]) -> bool:
+        return self.set(cell, self.X)
+
+    def set_as_O(self, cell: Union[int, str]) -> bool:
+        return self.set(cell, self.O)
+
+    def set_as_empty(self, cell: Union[int, str]) -> bool:
+        return self.set(cell, self.EMPTY)
+
+    def set(self, cell: Union[int, str], value: int) -> bool:
+        # returns True if setting the cell completed a line
+        cell = self.cell(cell)
+        old = self.cells[cell]
+        if old == value:
+            return False
+        
+        scope = self.scope(cell)
+        n = self.n
+        before = self.counts[:, scope] == n
+        if old != self.EMPTY:
+            self.counts[old - 1, scope] -= 1
+            self.key ^= int(self.zobrist[cell, old - 1])
+        if value != self.EMPTY:
+            self.counts[value - 1, scope] += 1
+            self.key ^= int(self.zobrist[cell, value - 1])
+        self.cells[cell] = value
+
+        counts = self.counts[:, scope]
+        after = counts == n
+        for p in (0, 1):
+            self.completed[p] += int(after[p].sum()) - int(before[p].sum())
+            threats = (counts[p] == n - 1) & (counts[1 - p] == 0)
+            self.threats[p].difference_update(scope[~threats].tolist())
+            self.threats[p].update(scope[threats].tolist())
+        return value != self.EMPTY and bool(after[value - 1].any())
+
+    @property
+    def winner(self) -> int:
+        # the player with a completed line, or EMPTY
+        if self.completed[0]:
+            return self.X
+        if self.completed[1]:
+            return self.O
+        return self.EMPTY
+
+    def threat_cells(self, player: int) -> np.ndarray:
+        # the empty cells that complete a threat line of player, and so
+        # must be blocked by the opponent
+        lines = self.lines[sorted(self.threats[player - 1])]
+        return np.unique(lines[self.cells[lines] == self.EMPTY])
+
+    def zobrist_key(self) -> int:
+        # the Zobrist key of the board, calculated from scratch
+        cells = np.flatnonzero(self.cells)
+        return int(np.bitwise_xor.reduce(self.zobrist[cells, self.cells[cells] - 1]))
+
+    def scope(self, cell: Union[int, str]) -> np.ndarray:
+        # the line numbers (rows of the line table) of the lines through cell
+        return hc.get_scope(self.scopes, self.cell(cell))
+
+    def line_values(self, cell: Union[int, str]) -> np.ndarray:
+        # the values of the cells of each line through cell
+        return self.cells[self.lines[self.scope(cell)]]
+
+    def score_moves(self, player: int, 
+                    heuristics: Union[Mapping[str, float], np.ndarray]) -> np.ndarray:
+        # the score of player moving in each cell: the sum of the weights 
+        # of the lines through the cell, by the number of stones of player 
+        # and the opponent in each line. Occupied cells score -inf. The 
+        # heuristics can also be given as a heuristics_table, which saves
+        # building it at every call.
+        table = _as_table(heuristics, self.n)
+        weights = table[self.counts[player - 1], self.counts[2 - player]]
+        scores = np.add.reduceat(weights[self.scopes.indices], self.scopes.indptr[:-1])
+        scores[self.cells != self.EMPTY] = -np.inf
+        return scores
+
+    def lines_info(self, cell: Union[int, str]) -> LinesInfo:
+        # for each line through a non-empty cell, the number of cells with 
+        # the same value as the cell, and with the opposite value
+        value = self.cells[self.cell(cell)]
+        if value == self.EMPTY:
+            raise ValueError("Cell cannot be empty")
+        
+        scope = self.scope(cell)
+        return self.LinesInfo(scope, self.counts[value - 1, scope], self.counts[2 - value, scope])
+
+
+
+
+
+class BoardBatch():
+    """ A batch of boards of a celled hypercube h(d, n), stored as one array.
+
+    The cells of the boards are a (size, n^d) int8 array, with values as 
+    in ArrayBoard. Moves are applied to all boards at once, and the lines
+    of all boards are evaluated with one fancy index on the shared line 
+    table, so games can be played in lock-step.
+
+    Examples
+    --------
+    >>> batch = BoardBatch(3, 2, 3)
+    >>> batch.play([0, 4, 8], batch.X).tolist()
+    [False, False, False]
+    >>> batch.play([1, 3, -1], batch.X).tolist()
+    [False, False, False]
+    >>> batch.play([2, 5, 4], [batch.X, batch.O, batch.X]).tolist()
+    [True, False, False]
+    >>> batch.cells.tolist()
+    [[1, 1, 1, 0, 0, 0, 0, 0, 0], [0, 0, 0, 1, 1, 2, 0, 0, 0], [0, 0, 0, 0, 1, 0, 0, 0, 1]]
+    >>> batch.winners().tolist()
+    [1, 0, 0]
+    >>> x_count, o_count = batch.line_counts()
+    >>> x_count[2].tolist()
+    [0, 1, 1, 0, 1, 1, 2, 1]
+    >>> import Settings
+    >>> heuristics = Settings.Settings.as_heuristics(3).heuristics
+    >>> scores = batch.score_moves(batch.O, heuristics)
+    >>> scores.argmax(axis = 1).tolist()
+    [4, 2, 0]
+    >>> batch.reset([0])
+    >>> batch.cells[0].tolist()
+    [0, 0, 0, 0, 0, 0, 0, 0, 0]
+    """
+
+    EMPTY = ArrayBoard.EMPTY
+    X = ArrayBoard.X
+    O = ArrayBoard.O
+
+    def __init__(self, size: int, d: int = 3, n: int = 4) -> None:
+        self.d = d
+        self.n = n
+        # the line table and scope index shared with other boards of the same size
+        self.lines: hc.LineTable
+        self.scopes: hc.ScopeIndex
+        _, self.lines, self.scopes = hc.cached_structure(d, n)
+        self.cells = np.zeros((size, n ** d), dtype = np.int8)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({len(self)}, {self.d}, {self.n})'
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def reset(self, boards: np.ndarray = None) -> None:
+        # clear the given boards, or all boards
+        if boards is None:
+            self.cells.fill(self.EMPTY)
+        else:
+            self.cells[boards] = self.EMPTY
+
+    def play(self, cells: np.ndarray, players: Union[int, np.ndarray]) -> np.ndarray:
+        # set cells[b] of board b to players[b], skipping boards where the 
+        # cell is negative. Returns which boards had a line completed.
+        cells = np.asarray(cells)
+        players = np.broadcast_to(players, cells.shape)
+        boards = np.flatnonzero(cells >= 0)
+        self.cells[boards, cells[boards]] = players[boards]
+
+        # only the lines through the played cells need to be checked. The
+        # scopes of the played cells are gathered into one array of lines.
+        completed = np.zeros(len(self), dtype = bool)
+        if len(boards) == 0:
+            return completed
+        indptr = self.scopes.indptr
+        sizes = indptr[cells[boards] + 1] - indptr[cells[boards]]
+        firsts = np.cumsum(sizes) - sizes
+        positions = np.repeat(indptr[cells[boards]] - firsts, sizes) + np.arange(sizes.sum())
+        lines = self.lines[self.scopes.indices[positions]]
+        values = self.cells[np.repeat(boards, sizes)[:, None], lines]
+        full = (values == np.repeat(players[boards], sizes)[:, None]).all(axis = 1)
+        completed[boards] = np.logical_or.reduceat(full, firsts)
+        return completed
+
+    def line_counts(self) -> np.ndarray:
+        # the number of Xs (element 0) and Os (element 1) in each line of 
+        # each board, as a (2, size, num_lines) array
+        values = self.cells[:, self.lines]
+        return np.stack([(values == self.X).sum(axis = 2), (values == self.O).sum(axis = 2)])
+
+    def winners(self) -> np.ndarray:
+        # the player with a completed line on each board, or EMPTY
+        completed = (self.line_counts() == self.n).any(axis = 2)
+        return np.where(completed[0], self.X, np.where(completed[1], self.O, self.EMPTY))
+
+    def score_moves(self, players: Union[int, np.ndarray], 
+                    heuristics: Union[Mapping[str, float], np.ndarray]) -> np.ndarray:
+        # the scores, as in ArrayBoard.score_moves, of players[b] moving in
+        # each cell of board b, as a (size, n^d) array
+        players = np.broadcast_to(players, len(self))[:, None]
+        counts = self.line_counts()
+        own = np.where(players == self.X, counts[0], counts[1])
+        opp = np.where(players == self.X, counts[1], counts[0])
+        weights = _as_table(heuristics, self.n)[own, opp]
+        scores = np.add.reduceat(weights[:, self.scopes.indices], self.scopes.indptr[:-1], axis = 1)
+        scores[self.cells != self.EMPTY] = -np.inf
+        return scores
+
+
+
+
+
 if __name__ == "__main__":
  
     dim = 2
@@ -0,0 +1,314 @@
+""" Provides the search engine of the heuristic player.
+
+The engine searches the moves of a Board2.ArrayBoard by negamax with
+alpha-beta pruning, to the depth of the player's Settings. Moves are
+made and unmade on the board itself, so the line counters, Zobrist key
+and threats of the board are updated incrementally rather than copied.
+
+A position at the search depth is evaluated with the player's heuristics:
+a line with i stones of one player, and none of the other, is worth Wi
+to that player and -Wi to the other. Moves are searched in the order of
+ArrayBoard.score_moves, best first, which makes alpha-beta cut off early.
+
+Positions reached again through a different order of moves are looked up
+in a TranspositionTable, keyed by the Zobrist key of the board. The table
+is a fixed number of preallocated numpy arrays, so its memory does not
+grow however long the search.
+"""
+
+
+import time
+
+# numpy doesn't yet have type annotations
+import numpy as np #type: ignore
+from typing import NamedTuple, Optional
+
+import Board2
+import Settings
+
+SearchResult = NamedTuple('SearchResult', [('move', int), ('score', float), ('nodes', int),
+                                           ('seconds', float), ('nps', float)])
+Entry = NamedTuple('Entry', [('depth', int), ('score', float), ('bound', int), ('move', int)])
+
+
+class TranspositionTable():
+    """ A fixed size table of searched positions, keyed by 64-bit hashes.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The memory budget of the table. The number of buckets is the
+        largest power of 2 that fits the budget.
+
+    Notes
+    -----
+    The entries are held in preallocated arrays of keys, depths, scores,
+    bound types and best moves. A key is stored in bucket key & mask, and
+    each bucket has two slots. The first slot keeps the entry searched to
+    the greatest depth, and the second slot takes any entry that is not
+    deep enough for the first, so recent positions are kept as well as
+    expensive ones. An empty slot has depth -1.
+
+    probes, hits, stores and collisions are counted. A collision is a
+    probe, or a store, that finds its bucket used by other keys.
+
+    Examples
+    --------
+    >>> table = TranspositionTable(2 ** 10)
+    >>> len(table), table.nbytes <= 2 ** 10
+    (16, True)
+    >>> table.store(7, 3, 1.5, table.EXACT, 12)
+    >>> table.probe(7)
+    Entry(depth=3, score=1.5, bound=0, move=12)
+    >>> table.probe(8) is None
+    True
+
+    A shallower entry in the same bucket goes into the second slot
+    >>> table.store(7 + len(table), 1, -2.0, table.UPPER, 5)
+    >>> table.probe(7), table.probe(7 + len(table)).depth
+    (Entry(depth=3, score=1.5, bound=0, move=12), 1)
+    >>> table.probe(7 + 2 * len(table)) is None
+    True
+    >>> table.probes, table.hits, table.collisions, table.hit_rate
+    (5, 3, 1, 0.6)
+    """
+
+    # bound types: the score is exact, a lower bound or an upper bound
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    SLOTS = 2
+    DTYPES = (np.uint64, np.int8, np.float64, np.int8, np.int32)
+
+    def __init__(self, max_bytes: int = 2 ** 24) -> None:
+        entry_bytes = self.SLOTS * sum(np.dtype(dtype).itemsize for dtype in self.DTYPES)
+        if max_bytes < entry_bytes:
+            raise ValueError(f"max_bytes must be at least {entry_bytes}")
+        size = 1 << (max_bytes // entry_bytes).bit_length() - 1
+        self.mask = size - 1
+        shape = (size, self.SLOTS)
+        self.keys = np.zeros(shape, dtype = np.uint64)
+        self.depths = np.full(shape, -1, dtype = np.int8)
+        self.scores = np.zeros(shape, dtype = np.float64)
+        self.bounds = np.zeros(shape, dtype = np.int8)
+        self.moves = np.full(shape, -1, dtype = np.int32)
+        self.probes = self.hits = self.stores = self.collisions = 0
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.nbytes})'
+
+    def __len__(self) -> int:
+        # the number of buckets
+        return self.mask + 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in (self.keys, self.depths, self.scores, self.bounds, self.moves))
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self) -> None:
+        self.depths.fill(-1)
+        self.moves.fill(-1)
+        self.probes = self.hits = self.stores = self.collisions = 0
+
+    def probe(self, key: int) -> Optional[Entry]:
+        # the entry of key, or None
+        self.probes += 1
+        i = key & self.mask
+        used = False
+        for slot in range(self.SLOTS):
+            if self.depths[i, slot] < 0:
+                continue
+            if self.keys[i, slot] == key:
+                self.hits += 1
+                return Entry(int(self.depths[i, slot]), float(self.scores[i, slot]),
+                             int(self.bounds[i, slot]), int(self.moves[i, slot]))
+            used = True
+        self.collisions += used
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: int) -> None:
+        self.stores += 1
+        i = key & self.mask
+        if self.keys[i, 0] == key or depth >= self.depths[i, 0]:
+            slot = 0
+        else:
+            slot = 1
+        if self.depths[i, slot] >= 0 and self.keys[i, slot] != key:
+            self.collisions += 1
+        self.keys[i, slot] = key
+        self.depths[i, slot] = depth
+        self.scores[i, slot] = score
+        self.bounds[i, slot] = bound
+        self.moves[i, slot] = move
+
+
+class Engine():
+    """ A negamax search with alpha-beta pruning for the heuristic player.
+
+    Parameters
+    ----------
+    settings : Settings.Settings
+        Heuristic (not interactive) settings. The search is to
+        settings.depth moves, and evaluated with settings.heuristics.
+    table : TranspositionTable, optional
+        The transposition table of the search, which is kept between
+        searches. Defaults to a new table of TABLE_BYTES bytes.
+
+    Examples
+    --------
+    >>> settings = Settings.Settings.as_heuristics(4, depth = 2)
+    >>> engine = Engine(settings)
+    >>> board = Board2.ArrayBoard(3, 4)
+    >>> engine.evaluate(board, Board2.ArrayBoard.X)
+    0.0
+    >>> for cell in (0, 1, 2):
+    ...     _ = board.set_as_X(cell)
+    >>> for cell in (21, 42, 63):
+    ...     _ = board.set_as_O(cell)
+
+    X completes the line 0, 1, 2, 3 rather than block O
+    >>> result = engine.search(board, Board2.ArrayBoard.X)
+    >>> result.move, result.score == engine.WIN + 2
+    (3, True)
+
+    O must block it
+    >>> engine.search(board, Board2.ArrayBoard.O).move
+    3
+
+    The board is left as it was
+    >>> board.key == board.zobrist_key(), board.empty_cells().size
+    (True, 58)
+
+    Searching again finds the position in the transposition table
+    >>> engine.search(board, Board2.ArrayBoard.X).nodes
+    1
+    """
+
+    # the score of a win; a win in fewer moves scores higher
+    WIN = 1e12
+    TABLE_BYTES = 2 ** 22
+    # xor-ed into the key of the board when O is to move
+    O_KEY = 0x9E3779B97F4A7C15
+
+    def __init__(self, settings: Settings.Settings,
+                 table: Optional[TranspositionTable] = None) -> None:
+        if settings.interactive:
+            raise ValueError("Engine requires heuristic settings")
+        self.settings = settings
+        self.depth = settings.depth
+        self.heuristics = settings.heuristics
+        # the heuristics as tables of the value of a line, and of the 
+        # weight of a move in a line, by the stones in the line
+        self.values = self.values_table(settings.n)
+        self.weights = Board2.heuristics_table(self.heuristics, settings.n)
+        self.table = TranspositionTable(self.TABLE_BYTES) if table is None else table
+        self.nodes = 0
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.settings!r})'
+
+    def values_table(self, n: int) -> np.ndarray:
+        # element [own, opp] is the value to the player of a line with own
+        # stones of the player and opp stones of the opponent
+        table = np.zeros((n + 1, n + 1))
+        for i in range(1, n + 1):
+            table[i, 0] = self.heuristics['W' + str(i)]
+            table[0, i] = -self.heuristics['W' + str(i)]
+        return table
+
+    def evaluate(self, board: Board2.ArrayBoard, player: int) -> float:
+        # the value of the board to player, by the heuristics
+        return float(self.values[board.counts[player - 1], board.counts[2 - player]].sum())
+
+    def search(self, board: Board2.ArrayBoard, player: int, depth: int = None) -> SearchResult:
+        """ Find the best move of player.
+
+        Parameters
+        ----------
+        board : Board2.ArrayBoard
+            The board to search, which must have an empty cell. It is
+            changed during the search, and restored before returning.
+        player : int
+            The player to move, Board2.ArrayBoard.X or Board2.ArrayBoard.O
+        depth : int, optional
+            The number of moves to search. Defaults to the depth of the
+            settings.
+
+        Returns
+        -------
+        SearchResult :
+            The best move (a flat cell index), its score to player, the
+            number of nodes searched, the time taken in seconds, and the
+            nodes searched per second.
+
+        Raises
+        ------
+        ValueError
+            If the board is not of the n of the settings
+        """
+
+        if board.n != self.settings.n:
+            raise ValueError(f"The heuristics are for n = {self.settings.n}, not {board.n}")
+        depth = self.depth if depth is None else depth
+        self.nodes = 0
+        start = time.perf_counter()
+        score, move = self.negamax(board, player, max(depth, 1), -np.inf, np.inf)
+        seconds = time.perf_counter() - start
+        return SearchResult(move, score, self.nodes, seconds, self.nodes / max(seconds, 1e-9))
+
+    def negamax(self, board: Board2.ArrayBoard, player: int, depth: int,
+                alpha: float, beta: float) -> tuple:
+        # the score of the board to player, who is to move, and the best move
+        self.nodes += 1
+        if depth == 0:
+            return self.evaluate(board, player), -1
+
+        key = board.key ^ self.O_KEY if player == board.O else board.key
+        entry = self.table.probe(key)
+        if entry is not None and entry.depth >= depth:
+            if entry.bound == self.table.EXACT:
+                return entry.score, entry.move
+            if entry.bound == self.table.LOWER:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if alpha >= beta:
+                return entry.score, entry.move
+
+        scores = board.score_moves(player, self.weights)
+        num_moves = len(scores) - np.count_nonzero(board.cells)
+        if entry is not None and board.cells[entry.move] == board.EMPTY:
+            # search the best move of an earlier search first
+            scores[entry.move] = np.inf
+        moves = np.argsort(-scores, kind = 'stable')[:num_moves]
+
+        alpha_start = alpha
+        best, best_move = -np.inf, -1
+        for move in moves.tolist():
+            if board.set(move, player):
+                score = self.WIN + depth
+            elif num_moves == 1:
+                score = 0.0 # the board is full, so a draw
+            else:
+                score = -self.negamax(board, 3 - player, depth - 1, -beta, -alpha)[0]
+            board.set_as_empty(move)
+
+            if score > best:
+                best, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best <= alpha_start:
+            bound = self.table.UPPER
+        elif best >= beta:
+            bound = self.table.LOWER
+        else:
+            bound = self.table.EXACT
+        self.table.store(key, depth, best, bound, best_move)
+        return best, best_move
@@ -1,6 +1,5 @@
 from collections import UserList
-from colorama import init, Fore, Back, Style
-init()
+from functools import lru_cache
 
 import Board
 import Players
@@ -21,6 +20,10 @@ class Game:
         self.board = Board.Board()
         self.players = (p1, p2)
         self.settings = (s1, s2)
+        # the engine of each heuristic player, which keeps its
+        # transposition table from move to move; it is only imported when
+        # needed, as it loads numpy
+        self.engines = [None, None]
         self.moves = []
         self._was_quit = False
     
@@ -34,11 +37,27 @@ class Game:
         # determine which player is to play (indexed at 0); get corresponding settings   
         p = len(self.moves) % 2
         s = self.settings[p]
-        if s.is_interactive:
+        if s.interactive:
             print("interactive")
             self.moves.append('111')
         else:
-            print("heuristics")
+            # search a copy of the board as an ArrayBoard, then play the best move
+            import Board2
+            import Engine
+            if self.engines[p] is None:
+                self.engines[p] = Engine.Engine(s)
+            board = Board2.ArrayBoard(3, 4)
+            for position, cell in self.board.items():
+                if not cell.is_empty:
+                    board.set(position, board.X if cell.is_X else board.O)
+            result = self.engines[p].search(board, p + 1)
+            position = board.position(result.move)
+            if p == 0:
+                self.board[position].set_as_X()
+            else:
+                self.board[position].set_as_O()
+            self.moves.append(position)
+            print(f'{position}: {result.nodes} nodes, {result.nps:.0f} nodes/s')
 
         # if quit then self._was quit = TRUE
 
@@ -49,7 +68,15 @@ class Game:
         except:
             return str
 
+    @staticmethod
+    @lru_cache(maxsize = None)
+    def init_colour():
+        # colorama is slow to import, so it is only initialised on first display 
+        from colorama import init
+        init()
+
     def display_term(self, players = True, settings = True):
+        self.init_colour()
         print(self.underline("test"))
         vis = ""
         for cell in self.board.cells_rlc():
@@ -0,0 +1,249 @@
+""" Benchmarks the scaling of the hypercube structure.
+
+For each h(d, n) in a grid, the benchmarks time, and profile the memory
+of, building the line table, the scope index and the whole structure,
+querying scopes and evaluating every line of a board. The default
+structure, of lines as views of the hypercube and a dict of scopes, is
+benchmarked too (get_lines, get_scopes and structure_views), on smaller
+hypercubes as it is much slower.
+
+The results can be saved as JSON, and two saved runs can be compared
+to report the benchmarks that slowed down, or used more memory, by more
+than a threshold.
+
+Usage:
+
+    python bench.py run --output base.json
+    python bench.py run --dims 3 5 --sizes 4 5 --output new.json
+    python bench.py compare base.json new.json --threshold 0.2
+"""
+
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# numpy doesn't yet have type annotations
+import numpy as np #type: ignore
+
+import hypercube as hc
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None # type: ignore
+
+Result = Dict[str, Any]
+
+# hypercubes with more lines than this are not benchmarked
+MAX_LINES = 5 * 10 ** 6
+# nor, for the default structure of views, with more lines than this
+MAX_VIEW_LINES = 3 * 10 ** 4
+
+
+def peak_rss() -> Optional[int]:
+    """ Return the peak resident set size of this process in bytes. """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> Dict[str, Any]:
+    """ Time a function, and trace the memory it allocates.
+
+    Parameters
+    ----------
+    func : Callable
+        The function to benchmark, which takes no arguments
+    repeat : int, optional
+        The number of timed calls. The fastest is reported.
+
+    Returns
+    -------
+    dict :
+        The fastest time in seconds ('time'), the peak memory traced by
+        tracemalloc in bytes ('peak_bytes'), and the number of memory
+        blocks still allocated by the traced call ('allocations').
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # tracing slows the call down, so it is separate from the timing
+    tracemalloc.start()
+    try:
+        before = len(tracemalloc.take_snapshot().traces)
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = len(tracemalloc.take_snapshot().traces) - before
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {'time': min(times), 'peak_bytes': peak, 'allocations': allocations}
+
+
+def benchmarks(d: int, n: int) -> Dict[str, Callable[[], Any]]:
+    """ Return the benchmarks, by name, of a hypercube h(d, n). """
+    lines = hc.get_line_table(d, n)
+    scopes = hc.get_scope_index(lines, d)
+    board = np.random.default_rng(0).integers(0, 3, n ** d, dtype = np.int8)
+    cells = np.arange(0, n ** d, max(1, n ** d // 1000))
+
+    def scope_queries() -> int:
+        return sum(len(hc.get_scope(scopes, cell)) for cell in cells)
+
+    def line_evaluation() -> np.ndarray:
+        values = board[lines]
+        return (values == 1).all(axis = 1) | (values == 2).all(axis = 1)
+
+    funcs = {'line_table': lambda: hc.get_line_table(d, n),
+             'scope_index': lambda: hc.get_scope_index(lines, d),
+             'structure': lambda: hc.structure(d, n, compact = True),
+             'scope_queries': scope_queries,
+             'line_evaluation': line_evaluation}
+
+    if hc.num_lines(d, n) <= MAX_VIEW_LINES:
+        arr = np.arange(n ** d).reshape([n] * d)
+        views, _ = hc.get_lines(arr)
+        funcs.update({'get_lines': lambda: hc.get_lines(arr),
+                      'get_scopes': lambda: hc.get_scopes(views, d),
+                      'structure_views': lambda: hc.structure(d, n)})
+    return funcs
+
+
+def run(dims: Sequence[int], sizes: Sequence[int], repeat: int = 3) -> Dict[str, Any]:
+    """ Run the benchmarks over a grid of hypercubes.
+
+    Parameters
+    ----------
+    dims : Sequence[int]
+        The numbers of dimensions of the hypercubes
+    sizes : Sequence[int]
+        The numbers of cells in any dimension of the hypercubes
+    repeat : int, optional
+        The number of timed calls of each benchmark
+
+    Returns
+    -------
+    dict :
+        The platform ('meta') and a list of results ('results'). Each
+        result has the benchmark name, d, n, the number of lines, the
+        measurements of the measure function and the peak RSS of the
+        process after the benchmark.
+    """
+
+    results: List[Result] = []
+    for d in dims:
+        for n in sizes:
+            num_lines = hc.num_lines(d, n)
+            if num_lines > MAX_LINES:
+                continue
+            for name, func in benchmarks(d, n).items():
+                result = {'name': name, 'd': d, 'n': n, 'num_lines': num_lines}
+                result.update(measure(func, repeat))
+                result['peak_rss'] = peak_rss()
+                results.append(result)
+
+    meta = {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results}
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any],
+            threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """ Compare two runs of the benchmarks.
+
+    Parameters
+    ----------
+    base : dict
+        The baseline run, as returned by run
+    new : dict
+        The run to compare to the baseline
+    threshold : float, optional
+        The relative increase in time or traced peak memory that is
+        reported as a regression
+
+    Returns
+    -------
+    list :
+        The regressions. Each has the benchmark name, d, n, the metric
+        ('time' or 'peak_bytes'), its baseline and new values, and their
+        ratio. Benchmarks that are not in both runs are ignored.
+
+    Examples
+    --------
+    >>> base = {'results': [{'name': 'structure', 'd': 3, 'n': 4, 'time': 1.0, 'peak_bytes': 100}]}
+    >>> new = {'results': [{'name': 'structure', 'd': 3, 'n': 4, 'time': 1.5, 'peak_bytes': 105}]}
+    >>> compare(base, new, 0.1)
+    [{'name': 'structure', 'd': 3, 'n': 4, 'metric': 'time', 'base': 1.0, 'new': 1.5, 'ratio': 1.5}]
+    >>> compare(base, new, 0.6)
+    []
+    """
+
+    def key(result: Result) -> tuple:
+        return (result['name'], result['d'], result['n'])
+
+    base_results = {key(result): result for result in base['results']}
+    regressions = []
+    for result in new['results']:
+        if key(result) not in base_results:
+            continue
+        for metric in ('time', 'peak_bytes'):
+            old, value = base_results[key(result)][metric], result[metric]
+            if old > 0 and value > old * (1 + threshold):
+                regressions.append({'name': result['name'], 'd': result['d'], 'n': result['n'],
+                                    'metric': metric, 'base': old, 'new': value,
+                                    'ratio': round(value / old, 3)})
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = 'Benchmark the hypercube structure.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    run_parser = commands.add_parser('run', help = 'run the benchmarks')
+    run_parser.add_argument('--dims', type = int, nargs = '+', default = [2, 3, 4, 5, 6])
+    run_parser.add_argument('--sizes', type = int, nargs = '+', default = [3, 4, 5])
+    run_parser.add_argument('--repeat', type = int, default = 3)
+    run_parser.add_argument('--output', help = 'save the results to this JSON file')
+
+    compare_parser = commands.add_parser('compare', help = 'compare two saved runs')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type = float, default = 0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run(args.dims, args.sizes, args.repeat)
+        for result in report['results']:
+            print(f"h({result['d']}, {result['n']}) {result['name']:<16} "
+                  f"{result['time'] * 1e3:10.3f} ms {result['peak_bytes'] / 2 ** 20:10.3f} MiB "
+                  f"{result['allocations']:8d} blocks")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent = 2)
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    for reg in regressions:
+        print(f"h({reg['d']}, {reg['n']}) {reg['name']:<16} {reg['metric']:<10} "
+              f"{reg['base']:.6g} -> {reg['new']:.6g} ({reg['ratio']}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+""" Provides compact binary storage of boards of celled hypercubes.
+
+A board of h(d, n) is stored with 2 bits per cell, using the cell values
+of Board2.ArrayBoard: 0 for empty, 1 for X and 2 for O. The cells are
+packed in flat index order, 4 to a byte, with the first cell in the two
+highest bits. So a board of the 4x4x4 game takes 16 bytes.
+
+A board file is a 16 byte header followed by the packed boards, one after
+another. The header is the magic bytes b'OXOB', the format version, d,
+n and the number of boards, all little-endian. Board files are read
+through numpy.memmap, so the boards are not copied into memory until
+they are unpacked.
+"""
+
+
+# numpy doesn't yet have type annotations
+import numpy as np #type: ignore
+from typing import Iterable, NamedTuple
+
+MAGIC = b'OXOB'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u1'), ('d', '<u1'), ('n', '<u2'),
+                   ('count', '<u8')])
+
+BoardFile = NamedTuple('BoardFile', [('d', int), ('n', int), ('packed', np.ndarray)])
+
+
+def packed_size(num_cells: int) -> int:
+    """ Returns the number of bytes of a packed board with num_cells cells.
+
+    Examples
+    --------
+    >>> packed_size(4 ** 3)
+    16
+    >>> packed_size(3 ** 2)
+    3
+    """
+
+    return -(-num_cells // 4)
+
+
+def pack_boards(cells: np.ndarray) -> np.ndarray:
+    """ Pack boards into 2 bits per cell.
+
+    Parameters
+    ----------
+    cells : numpy.ndarray
+        The cell values of a board, of shape (n^d,), or of many boards,
+        of shape (count, n^d).
+
+    Returns
+    -------
+    numpy.ndarray :
+        A uint8 array of shape (packed_size(n^d),) or
+        (count, packed_size(n^d)).
+
+    Raises
+    ------
+    ValueError
+        If a cell value is not 0, 1 or 2
+
+    See Also
+    --------
+    unpack_boards
+
+    Examples
+    --------
+    >>> pack_boards(np.array([1, 2, 0, 0, 1])).tolist()
+    [96, 64]
+    >>> pack_boards(np.zeros((2, 64), dtype = np.int8)).shape
+    (2, 16)
+    >>> pack_boards(np.array([1, 4]))
+    Traceback (most recent call last):
+    ...
+    ValueError: Cell values must be 0, 1 or 2
+    """
+
+    cells = np.asarray(cells)
+    if cells.size and (cells.min() < 0 or cells.max() > 2):
+        raise ValueError("Cell values must be 0, 1 or 2")
+    cells = cells.astype(np.uint8)
+    bits = np.stack([cells >> 1, cells & 1], axis = -1).reshape(*cells.shape[:-1], 2 * cells.shape[-1])
+    return np.packbits(bits, axis = -1)
+
+
+def unpack_boards(packed: np.ndarray, num_cells: int) -> np.ndarray:
+    """ Unpack boards packed with 2 bits per cell.
+
+    Parameters
+    ----------
+    packed : numpy.ndarray
+        A packed board, or many packed boards, as returned by pack_boards
+    num_cells : int
+        The number of cells of a board, n^d
+
+    Returns
+    -------
+    numpy.ndarray :
+        An int8 array of cell values, of shape (n^d,) or (count, n^d).
+
+    See Also
+    --------
+    pack_boards
+
+    Examples
+    --------
+    >>> unpack_boards(np.array([96, 64], dtype = np.uint8), 5).tolist()
+    [1, 2, 0, 0, 1]
+    >>> cells = np.random.default_rng(0).integers(0, 3, (100, 64), dtype = np.int8)
+    >>> np.array_equal(unpack_boards(pack_boards(cells), 64), cells)
+    True
+    """
+
+    bits = np.unpackbits(packed, axis = -1, count = 2 * num_cells)
+    bits = bits.reshape(*bits.shape[:-1], num_cells, 2)
+    return (bits[..., 0] << 1 | bits[..., 1]).astype(np.int8)
+
+
+def save_boards(path: str, boards: Iterable[np.ndarray], d: int, n: int) -> int:
+    """ Save boards to a board file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the board file. An existing file is overwritten.
+    boards : Iterable[numpy.ndarray]
+        The cell values of the boards, as arrays of shape (count, n^d).
+        Each array is packed and written in turn, so millions of boards
+        can be saved a chunk at a time.
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+
+    Returns
+    -------
+    int :
+        The number of boards saved.
+
+    Raises
+    ------
+    ValueError
+        If a cell value is not 0, 1 or 2. The file is then left with
+        a count of 0 boards.
+
+    See Also
+    --------
+    load_boards
+    """
+
+    header = np.zeros(1, dtype = HEADER)
+    header[0] = (MAGIC, VERSION, d, n, 0)
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        count = 0
+        for cells in boards:
+            cells = np.asarray(cells).reshape(-1, n ** d)
+            f.write(pack_boards(cells).tobytes())
+            count += len(cells)
+        # the number of boards is only known at the end
+        header['count'] = count
+        f.seek(0)
+        f.write(header.tobytes())
+    return count
+
+
+def load_boards(path: str) -> BoardFile:
+    """ Load the boards of a board file, without copying them into memory.
+
+    Parameters
+    ----------
+    path : str
+        The path of the board file
+
+    Returns
+    -------
+    BoardFile :
+        A named tuple of d, n and the packed boards, as a read-only
+        numpy.memmap of shape (count, packed_size(n^d)). Boards are
+        unpacked with unpack_boards.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a board file of a known version
+
+    See Also
+    --------
+    save_boards
+    unpack_boards
+
+    Examples
+    --------
+    >>> import os, tempfile
+    >>> cells = np.random.default_rng(0).integers(0, 3, (1000, 64), dtype = np.int8)
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     path = os.path.join(tmp, 'boards.oxo')
+    ...     save_boards(path, np.split(cells, 4), 3, 4)
+    ...     os.path.getsize(path)
+    ...     board_file = load_boards(path)
+    ...     board_file.d, board_file.n, board_file.packed.shape
+    ...     np.array_equal(unpack_boards(board_file.packed, 64), cells)
+    ...     del board_file
+    1000
+    16016
+    (3, 4, (1000, 16))
+    True
+    """
+
+    header = np.fromfile(path, dtype = HEADER, count = 1)
+    if len(header) == 0 or header['magic'][0] != MAGIC:
+        raise ValueError(f'{path} is not a board file')
+    if header['version'][0] != VERSION:
+        raise ValueError(f'{path} has unknown version {header["version"][0]}')
+
+    d, n, count = (int(header[key][0]) for key in ('d', 'n', 'count'))
+    if count == 0:
+        return BoardFile(d, n, np.zeros((0, packed_size(n ** d)), dtype = np.uint8))
+    packed = np.memmap(path, dtype = np.uint8, mode = 'r', offset = HEADER.itemsize,
+                       shape = (count, packed_size(n ** d)))
+    return BoardFile(d, n, packed)
@@ -33,19 +33,33 @@ An array of d dimensions may be referred to as a d-array.
 """
 
 
-# numpy and scipy don't yet have type annotations
+# numpy doesn't yet have type annotations
 import numpy as np #type: ignore
-from scipy.special import comb #type: ignore
 import itertools as it
-from collections import defaultdict, Counter as counter
-from typing import List, Callable, Union, Collection, Tuple, Any, DefaultDict, TypeVar, Counter, Dict
+from math import comb, factorial
+import os
+import weakref
+from functools import lru_cache
+from collections import defaultdict, OrderedDict, Counter as counter
+from typing import List, Callable, Union, Collection, Tuple, Any, DefaultDict, TypeVar, Counter, Dict, NamedTuple, Iterator
 
 # type aliases
 Line = TypeVar('Line') # line should really be a 1d numpy array
 Lines = List[Line]
 Cell = Tuple[int]
 Scopes = DefaultDict[Cell, Lines]  
-Structure = Tuple[np.ndarray, Lines, Scopes]
+LineTable = np.ndarray # 2d numpy array of flat cell indices, one row per line
+# compressed sparse row index of the lines (rows of a line table) 
+# containing each flat cell index
+ScopeIndex = NamedTuple('ScopeIndex', [('indptr', np.ndarray), ('indices', np.ndarray)])
+Structure = Tuple[np.ndarray, Union[Lines, LineTable], Union[Scopes, ScopeIndex]]
+CompactStructure = Tuple[np.ndarray, LineTable, ScopeIndex]
+CellClasses = NamedTuple('CellClasses', [('coords', np.ndarray), ('edges', np.ndarray), 
+                                         ('faces', np.ndarray)])
+
+# version of the files written by save_structure. Increment this if the
+# line table or scope index change, e.g. the order of the lines.
+CACHE_VERSION = 1
 
 def num_lines(d: int, n: int) -> int: 
     """ Calculate the number of lines in a hypercube.  
@@ -113,12 +127,84 @@ def num_lines(d: int, n: int) -> int:
     8
     >>> num_lines(3, 4)
     76
+    >>> num_lines(20, 10)
+    1866879996223737561088
     """
 
-    count = 0
-    for i in range(1, d + 1):
-        count += comb(d, i, True) * (n ** (d - i)) * (2 ** (i - 1)) 
-    return count
+    return sum(num_lines_agonal(d, n).values())
+
+
+def num_lines_agonal(d: int, n: int) -> Dict[int, int]:
+    """ Calculate the number of lines of each m-agonal type in a hypercube.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+ 
+    Returns
+    -------
+    dict:
+        The number of m-agonal lines (value) for each m (key), 
+        1 <= m <= d, in a hypercube h(d, n). The counts are exact 
+        integers for any d and n.
+
+    See Also
+    --------
+    num_lines
+    num_lines_grid
+
+    Notes
+    -----
+    From the notes section of the function num_lines, the number of 
+    m-agonal lines is
+
+        l_m = dCm * n^(d-m) * 2^(m-1)
+
+    Examples
+    --------
+    >>> num_lines_agonal(2, 3)
+    {1: 6, 2: 2}
+    >>> num_lines_agonal(3, 4)
+    {1: 48, 2: 24, 3: 4}
+    """
+
+    return {m: comb(d, m) * n ** (d - m) * 2 ** (m - 1) for m in range(1, d + 1)}
+
+
+def num_lines_grid(ds: Collection[int], ns: Collection[int]) -> \
+                   Dict[Tuple[int, int], Dict[int, int]]:
+    """ Tabulate the number of lines of each m-agonal type over a grid.
+
+    Parameters
+    ----------
+    ds : Collection[int]
+        The numbers of dimensions of the hypercubes
+    ns : Collection[int]
+        The numbers of cells in any dimension of the hypercubes
+ 
+    Returns
+    -------
+    dict:
+        The m-agonal line counts, as returned by num_lines_agonal(d, n), 
+        for each (d, n) key in the grid of `ds` and `ns`.
+
+    See Also
+    --------
+    num_lines_agonal
+
+    Examples
+    --------
+    >>> grid = num_lines_grid(range(2, 4), range(3, 5))
+    >>> grid[(3, 4)]
+    {1: 48, 2: 24, 3: 4}
+    >>> {key: sum(value.values()) for key, value in grid.items()}
+    {(2, 3): 8, (2, 4): 10, (3, 3): 49, (3, 4): 76}
+    """
+
+    return {(d, n): num_lines_agonal(d, n) for d in ds for n in ns}
 
 
 def get_diagonals() -> Callable[[Line], Lines]:
@@ -264,6 +350,7 @@ def get_lines(arr: np.ndarray, flatten: bool = True) -> \
     --------
     num_lines
     get_diagonals
+    get_line_table
 
     Notes
     -----
@@ -393,7 +480,717 @@ def get_scopes(lines: Lines, d: int) -> Scopes:
     return scopes
 
 
-def structure(d: int, n: int) -> Structure:
+def get_line_table(d: int, n: int) -> LineTable:
+    """ Returns the lines of a hypercube as a single array of cell indices.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+
+    Returns
+    -------
+    numpy.ndarray :
+        A contiguous array of shape (num_lines(d, n), n). Each row is a
+        line, given as the flat indices of its cells. That is, a cell
+        (i_1, ..., i_d) has flat index np.ravel_multi_index((i_1, ..., i_d),
+        [n] * d).
+
+    Raises
+    ------
+    AssertionError
+        If number of lines returned by this function does not
+        equal that calculated by the num_lines function.
+        THIS IS A CRITCAL ERROR THAT MEANS THIS FUNCTION HAS
+        A FLAWED IMPLEMENTATION.
+
+    See Also
+    --------
+    get_lines
+    num_lines
+
+    Notes
+    -----
+    A line table stores every line in one block of memory rather than as 
+    a list of numpy.ndarray views, each with its own object header. 
+    The values of the lines of a board `arr` of shape [n] * d can be
+    retrieved with a single fancy index: arr.ravel()[line_table].
+
+    The lines are built directly, without slicing an array, following the
+    constructive proof in the notes section of the function num_lines.
+    For each combination of i axes and each cell in the other d - i axes,
+    an i-agonal is determined by the direction it takes along each of the
+    i axes. Fixing the direction along the first axis to be increasing 
+    leaves 2^(i-1) sign vectors, one per i-agonal. Along an axis with an
+    increasing direction the k-th cell of the line has coordinate k, and
+    along an axis with a decreasing direction it has coordinate n - 1 - k.
+    The flat indices of all these lines are computed with broadcasting.
+
+    The lines are ordered by i, then by combination of axes, then by 
+    the cell in the other axes and then by sign vector. This differs 
+    from the order of get_lines, although the lines are the same.
+
+    Examples
+    --------
+    >>> line_table = get_line_table(2, 2)
+    >>> line_table.shape
+    (6, 2)
+    >>> line_table.tolist()
+    [[0, 2], [1, 3], [0, 1], [2, 3], [0, 3], [1, 2]]
+    >>> arr = np.array([[1, 1], 
+    ...                 [0, 2]])
+    >>> arr.ravel()[line_table].tolist()
+    [[1, 0], [1, 2], [1, 1], [0, 2], [1, 2], [1, 0]]
+
+    The lines are the same as those of get_lines
+    >>> arr = np.arange(3 ** 4).reshape([3] * 4)
+    >>> lines, _ = get_lines(arr)
+    >>> line_table = get_line_table(4, 3)
+    >>> sorted(sorted(line) for line in line_table.tolist()) == \\
+    ...     sorted(sorted(line) for line in np.array(lines).tolist())
+    True
+    """
+
+    table = np.empty((num_lines(d, n), n), dtype = _index_dtype(d, n))
+    count = 0
+    for i in range(1, d + 1): 
+        # all combinations of i axes are built at once
+        i_combs = list(it.combinations(range(d), r = i))
+        lines = _lines(d, n, i_combs, 0, n ** (d - i))
+        table[count:count + len(lines)] = lines
+        count += len(lines)
+
+    assert count == len(table)
+    return table
+
+
+def get_comb_lines(d: int, n: int, i_comb: Tuple[int, ...], 
+                   start: int = 0, stop: int = None) -> LineTable:
+    """ Returns the i-agonals that lie in a given combination of i axes.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    i_comb : tuple
+        The axes, in increasing order, along which the lines vary
+    start : int, optional
+        The first cell in the other d - i axes. The cells in the other
+        axes are numbered 0,1,2, ..., n^(d-i) - 1 in row-major order.
+    stop : int, optional
+        One past the last cell in the other d - i axes. By default, all
+        cells from `start` are used.
+
+    Returns
+    -------
+    numpy.ndarray :
+        An array of shape ((stop - start) * 2^(i-1), n) of lines given as
+        flat cell indices.
+
+    See Also
+    --------
+    get_line_table
+
+    Examples
+    --------
+    >>> get_comb_lines(2, 3, (1,)).tolist()
+    [[0, 1, 2], [3, 4, 5], [6, 7, 8]]
+    >>> get_comb_lines(2, 3, (1,), 1, 2).tolist()
+    [[3, 4, 5]]
+    >>> get_comb_lines(2, 3, (0, 1)).tolist()
+    [[0, 4, 8], [2, 4, 6]]
+    """
+
+    if stop is None:
+        stop = n ** (d - len(i_comb))
+    return _lines(d, n, [i_comb], start, stop)
+
+
+def _lines(d: int, n: int, i_combs: List[Tuple[int, ...]], 
+           start: int, stop: int) -> LineTable:
+    # lines of several combinations of the same number of axes, i
+    i = len(i_combs[0])
+    dtype = _index_dtype(d, n)
+    strides = n ** np.arange(d - 1, -1, -1, dtype = dtype)
+    other_axes = [[axis for axis in range(d) if axis not in i_comb] 
+                  for i_comb in i_combs]
+
+    # flat index of the first cell of the lines in the other axes
+    cells = np.arange(start, stop, dtype = dtype)
+    digits = cells[:, None] // (n ** np.arange(d - i - 1, -1, -1, dtype = dtype)) % n
+    base = strides[other_axes] @ digits.T
+
+    # sign vectors: 0 for increasing and 1 for decreasing along an axis,
+    # where the first axis is always increasing
+    signs = np.arange(2 ** (i - 1))[:, None] >> np.arange(i - 1, -1, -1) & 1
+    # coordinates along the i axes: k or n - 1 - k
+    k = np.arange(n, dtype = dtype)
+    coords = np.where(signs[:, :, None], n - 1 - k, k).astype(dtype)
+    steps = np.einsum('sik,ci->csk', coords, strides[i_combs])
+
+    # lines ordered by combination, cell and then sign vector
+    lines = base[:, :, None, None] + steps[:, None, :, :]
+    return lines.reshape(-1, n)
+
+
+def structure_parallel(d: int, n: int, processes: int = None, 
+                       chunk_size: int = 2 ** 16) -> CompactStructure:
+    """ Return the compact structure of a hypercube, built by a pool of processes.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    processes : int, optional
+        The number of worker processes. Defaults to os.cpu_count().
+    chunk_size : int, optional
+        The approximate number of lines built by a worker in one task
+
+    Returns
+    -------
+    tuple :
+        The same hypercube, line table and scope index as 
+        structure(d, n, compact = True).
+
+    See Also
+    --------
+    structure
+    get_line_table
+    get_scope_index
+
+    Notes
+    -----
+    The line table and the indices of the scope index are preallocated 
+    in shared memory, and built in two rounds of tasks.
+
+    The lines of each combination of axes, split into ranges of cells in
+    the other axes, are independent tasks. Their position in the line
+    table is known in advance, so each worker writes its lines straight
+    into the line table.
+
+    The line table is then split into one range of rows per process.
+    Each worker counts the cells of its rows, and the counts are summed
+    into the pointers of the scope index. The counts also give the offset
+    in the indices at which each worker writes the lines of each cell, 
+    so each worker writes the lines of its rows straight into the 
+    indices, reading only its own rows.
+
+    The returned line table and indices are the shared memory itself,
+    which is freed when they are, so the structure is never copied.
+
+    Examples
+    --------
+    >>> arr, lines, scopes = structure_parallel(4, 3, processes = 2, chunk_size = 10)
+    >>> np.array_equal(lines, get_line_table(4, 3))
+    True
+    >>> all(np.array_equal(a, b) for a, b in zip(scopes, get_scope_index(lines, 4)))
+    True
+    """
+
+    # multiprocessing is only imported when needed as it is slow to import
+    from multiprocessing import Pool, shared_memory
+
+    dtype = _index_dtype(d, n)
+    num = num_lines(d, n)
+    line_dtype = np.dtype(np.int64 if num > 2 ** 31 else np.int32)
+    processes = processes or os.cpu_count()
+
+    tasks = []
+    count = 0
+    for i in range(1, d + 1): 
+        num_cells = n ** (d - i)
+        step = max(1, chunk_size // 2 ** (i - 1))
+        for i_comb in it.combinations(range(d), r = i):
+            for start in range(0, num_cells, step):
+                stop = min(start + step, num_cells)
+                tasks.append((d, n, i_comb, start, stop, count))
+                count += (stop - start) * 2 ** (i - 1)
+    assert count == num
+
+    shms = [shared_memory.SharedMemory(create = True, size = max(1, num * n * np.dtype(t).itemsize))
+            for t in (dtype, line_dtype)]
+    lines: LineTable = np.ndarray((num, n), dtype = dtype, buffer = shms[0].buf)
+    indices: np.ndarray = np.ndarray(num * n, dtype = line_dtype, buffer = shms[1].buf)
+    for arr, shm in zip((lines, indices), shms):
+        # the shared memory is closed when the array using it is freed
+        weakref.finalize(arr, shm.close).atexit = False
+    try:
+        args = ([shm.name for shm in shms], (num, n), dtype, line_dtype)
+        with Pool(processes, _attach_structure, args) as pool:
+            pool.map(_fill_lines, tasks, chunksize = max(1, len(tasks) // (4 * processes)))
+
+            bounds = np.linspace(0, num, processes + 1).astype(np.int64)
+            ranges = list(zip(bounds[:-1], bounds[1:]))
+            counts = np.array(pool.starmap(_count_cells, [(r0, r1, n ** d) for r0, r1 in ranges]))
+            indptr = np.zeros(n ** d + 1, dtype = np.int64)
+            np.cumsum(counts.sum(axis = 0), out = indptr[1:])
+
+            # the lines of a cell are written by each worker in turn, 
+            # so they are in the same order as in the line table
+            offsets = indptr[:-1] + np.cumsum(counts, axis = 0) - counts
+            pool.map(_fill_scopes, [(n, r0, r1, offsets[k]) for k, (r0, r1) in enumerate(ranges)],
+                     chunksize = 1)
+    finally:
+        # the name is removed now, and the memory freed once it is closed
+        for shm in shms:
+            shm.unlink()
+
+    arr = np.zeros([n] * d, dtype = dtype)
+    return (arr, lines, ScopeIndex(indptr, indices))
+
+
+# the shared memory, line table and scope indices of a worker process 
+# of structure_parallel
+_shared: List[Any] = []
+
+
+def _attach_structure(names: List[str], shape: Tuple[int, int], 
+                      dtype: np.dtype, line_dtype: np.dtype) -> None:
+    from multiprocessing import shared_memory
+    shms = [shared_memory.SharedMemory(name = name) for name in names]
+    lines: LineTable = np.ndarray(shape, dtype = dtype, buffer = shms[0].buf)
+    indices: np.ndarray = np.ndarray(shape[0] * shape[1], dtype = line_dtype, buffer = shms[1].buf)
+    _shared[:] = [shms, lines, indices]
+
+
+def _fill_lines(task: Tuple[int, int, Tuple[int, ...], int, int, int]) -> None:
+    d, n, i_comb, start, stop, row = task
+    lines = get_comb_lines(d, n, i_comb, start, stop)
+    _shared[1][row:row + len(lines)] = lines
+
+
+def _count_cells(r0: int, r1: int, num_cells: int) -> np.ndarray:
+    # the number of lines through each cell in rows r0, ..., r1 - 1
+    return np.bincount(_shared[1][r0:r1].ravel(), minlength = num_cells)
+
+
+def _fill_scopes(task: Tuple[int, int, int, np.ndarray]) -> None:
+    # write rows r0, ..., r1 - 1 into the scopes of their cells; the 
+    # lines of cell c are written from offsets[c] on
+    n, r0, r1, offsets = task
+    cells = _shared[1][r0:r1].ravel()
+    order = np.argsort(cells, kind = 'stable')
+    sorted_cells = cells[order]
+    counts = np.bincount(cells, minlength = len(offsets))
+    starts = np.cumsum(counts) - counts
+    pos = offsets[sorted_cells] + np.arange(len(cells)) - starts[sorted_cells]
+    _shared[2][pos] = r0 + order // n
+
+
+def cell_scope(cell: Union[int, Tuple[int, ...]], d: int, n: int) -> LineTable:
+    """ Returns the lines through a cell, without building any other lines.
+
+    Parameters
+    ----------
+    cell : Union[int, tuple]
+        The cell, as a flat index or as coordinates
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+
+    Returns
+    -------
+    numpy.ndarray :
+        An array of shape (scope length, n) of the lines containing 
+        `cell`, given as flat cell indices. The lines are the rows of 
+        the line table in the scope of `cell`, in the same order.
+
+    See Also
+    --------
+    get_line_table
+    get_scope
+    scopes_size_analytic
+
+    Notes
+    -----
+    As shown in the notes section of the function scopes_size_analytic, 
+    a line through the cell varies along a set of axes S whose coordinates
+    have the same distance from the edge. So only the subsets of the 
+    groups of axes with equal distances are considered. Given S, the 
+    direction along each axis of S, relative to the first, is increasing 
+    if its coordinate equals that of the first axis, and decreasing if
+    it equals n - 1 minus that of the first axis. 
+    
+    The cost is proportional to the scope length times n + d, and no
+    global tables are used.
+
+    Examples
+    --------
+    >>> cell_scope((0, 1), 2, 3).tolist()
+    [[1, 4, 7], [0, 1, 2]]
+    >>> cell_scope(4, 2, 3).tolist()
+    [[1, 4, 7], [3, 4, 5], [0, 4, 8], [2, 4, 6]]
+    >>> lines, scopes = get_line_table(3, 4), get_scope_index(get_line_table(3, 4), 3)
+    >>> all(np.array_equal(cell_scope(c, 3, 4), lines[get_scope(scopes, c)]) 
+    ...     for c in range(4 ** 3))
+    True
+    >>> len(cell_scope((0, 1) * 5, 10, 4))
+    62
+    """
+
+    coords: Tuple[int, ...]
+    if isinstance(cell, (int, np.integer)):
+        coords = tuple(int(x) for x in np.unravel_index(cell, [n] * d))
+    else:
+        coords = tuple(cell)
+    strides = [n ** (d - 1 - axis) for axis in range(d)]
+    base = sum(x * stride for x, stride in zip(coords, strides))
+
+    # group the axes by the distance of their coordinate from the edge
+    groups: DefaultDict = defaultdict(list)
+    for axis, x in enumerate(coords):
+        groups[min(x, n - 1 - x)].append(axis)
+
+    lines = []
+    for axes in groups.values():
+        for i in range(1, len(axes) + 1):
+            for i_comb in it.combinations(axes, r = i):
+                first = coords[i_comb[0]]
+                # the possible directions along the other axes: 0 for 
+                # increasing and 1 for decreasing
+                dirs = [[sign for sign, x in ((0, first), (1, n - 1 - first)) 
+                         if coords[axis] == x] for axis in i_comb[1:]]
+                for signs in it.product(*dirs):
+                    lines.append((i, i_comb, signs))
+    lines.sort()
+
+    # the k-th cell of a line is start + k * step
+    starts, steps = [], []
+    for _, i_comb, signs in lines:
+        start = base - sum(coords[axis] * strides[axis] for axis in i_comb)
+        step = 0
+        for axis, sign in zip(i_comb, (0,) + signs):
+            start += sign * (n - 1) * strides[axis]
+            step += (1 - 2 * sign) * strides[axis]
+        starts.append(start)
+        steps.append(step)
+
+    dtype = _index_dtype(d, n)
+    k = np.arange(n, dtype = dtype)
+    return np.array(starts, dtype = dtype)[:, None] + np.array(steps, dtype = dtype)[:, None] * k
+
+
+def iter_lines(d: int, n: int, chunk_size: int = 2 ** 16) -> Iterator[LineTable]:
+    """ Generates the lines of a hypercube in chunks.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    chunk_size : int, optional
+        The number of lines in each chunk
+
+    Yields
+    ------
+    numpy.ndarray :
+        An array of shape (chunk_size, n) of lines given as flat cell 
+        indices. The last chunk may have fewer lines.
+
+    See Also
+    --------
+    get_line_table
+    get_comb_lines
+
+    Notes
+    -----
+    The lines are generated in the same order as get_line_table, but 
+    without holding more than a chunk of them in memory at once. This is
+    for hypercubes whose line table does not fit into memory.
+
+    Examples
+    --------
+    >>> chunks = list(iter_lines(2, 3, 3))
+    >>> [chunk.tolist() for chunk in chunks]
+    [[[0, 3, 6], [1, 4, 7], [2, 5, 8]], [[0, 1, 2], [3, 4, 5], [6, 7, 8]], [[0, 4, 8], [2, 4, 6]]]
+    >>> chunks = iter_lines(4, 3, 100)
+    >>> np.array_equal(np.concatenate(list(chunks)), get_line_table(4, 3))
+    True
+    """
+
+    buffer = np.empty((chunk_size, n), dtype = _index_dtype(d, n))
+    filled = 0
+    for i in range(1, d + 1):
+        # take as many cells in the other axes as fit into a chunk 
+        num_cells = n ** (d - i)
+        step = max(1, chunk_size // 2 ** (i - 1))
+        for i_comb in it.combinations(range(d), r = i):
+            for start in range(0, num_cells, step):
+                lines = get_comb_lines(d, n, i_comb, start, min(start + step, num_cells))
+                while len(lines):
+                    size = min(chunk_size - filled, len(lines))
+                    buffer[filled:filled + size] = lines[:size]
+                    lines = lines[size:]
+                    filled += size
+                    if filled == chunk_size:
+                        yield buffer.copy()
+                        filled = 0
+
+    if filled:
+        yield buffer[:filled].copy()
+
+
+def get_line_masks(line_table: LineTable) -> List[int]:
+    """ Returns the lines of a hypercube as bitmasks over flat cell indices.
+
+    Parameters
+    ----------
+    line_table : numpy.ndarray
+        The lines of the hypercube, as returned by get_line_table(d, n).
+
+    Returns
+    -------
+    list :
+        A list of int, one per line. Bit c of a mask is set if the cell
+        with flat index c is in the line.
+
+    See Also
+    --------
+    get_line_words
+    get_cell_mask
+
+    Notes
+    -----
+    Python ints have unlimited size, so this works for any hypercube.
+    If the stones of a player are a mask, then the player has completed
+    a line if (mask & line) == line.
+
+    Examples
+    --------
+    >>> line_table = get_line_table(2, 2)
+    >>> [bin(mask) for mask in get_line_masks(line_table)]
+    ['0b101', '0b1010', '0b11', '0b1100', '0b1001', '0b110']
+    >>> mask = get_cell_mask([0, 1, 2])
+    >>> [line for line in get_line_masks(line_table) if mask & line == line]
+    [5, 3, 6]
+    """
+
+    return [sum(1 << cell for cell in line) for line in line_table.tolist()]
+
+
+def get_cell_mask(cells: Collection[int]) -> int:
+    """ Returns a bitmask, as an int, of a collection of flat cell indices.
+
+    Parameters
+    ----------
+    cells : Collection[int]
+        The flat indices of the cells, for example the stones of a player.
+
+    Returns
+    -------
+    int :
+        The bitmask, with bit c set for each cell c in `cells`.
+
+    See Also
+    --------
+    get_line_masks
+
+    Examples
+    --------
+    >>> bin(get_cell_mask([0, 3]))
+    '0b1001'
+    """
+
+    return sum(1 << cell for cell in set(cells))
+
+
+def get_line_words(line_table: LineTable, num_cells: int) -> np.ndarray:
+    """ Returns the lines of a hypercube as bitmasks packed into uint64 words.
+
+    Parameters
+    ----------
+    line_table : numpy.ndarray
+        The lines of the hypercube, as returned by get_line_table(d, n).
+    num_cells : int
+        The number of cells in the hypercube, n^d.
+
+    Returns
+    -------
+    numpy.ndarray :
+        A uint64 array of shape (num_lines, w) where w = ceil(num_cells / 64).
+        Bit c % 64 of word c // 64 of a row is set if the cell with flat 
+        index c is in the line. For the 4x4x4 game, w is 1.
+
+    See Also
+    --------
+    get_line_masks
+    get_cell_words
+    completed_lines
+
+    Examples
+    --------
+    >>> line_table = get_line_table(3, 4)
+    >>> line_words = get_line_words(line_table, 4 ** 3)
+    >>> line_words.shape
+    (76, 1)
+    >>> int(line_words[0, 0]) == get_line_masks(line_table)[0]
+    True
+    """
+
+    num_words = -(-num_cells // 64)
+    cells = line_table.astype(np.uint64)
+    rows = np.repeat(np.arange(len(line_table)), line_table.shape[1])
+    words = np.zeros((len(line_table), num_words), dtype = np.uint64)
+    np.bitwise_or.at(words, (rows, (cells // 64).ravel().astype(np.intp)), 
+                     (np.uint64(1) << (cells % 64)).ravel())
+    return words
+
+
+def get_cell_words(cells: Collection[int], num_cells: int) -> np.ndarray:
+    """ Returns a bitmask, as uint64 words, of a collection of flat cell indices.
+
+    Parameters
+    ----------
+    cells : Collection[int]
+        The flat indices of the cells, for example the stones of a player.
+    num_cells : int
+        The number of cells in the hypercube, n^d.
+
+    Returns
+    -------
+    numpy.ndarray :
+        A uint64 array of ceil(num_cells / 64) words, packed as in 
+        get_line_words.
+
+    Examples
+    --------
+    >>> get_cell_words([0, 1, 64], 65).tolist()
+    [3, 1]
+    """
+
+    cells = np.unique(np.asarray(cells, dtype = np.uint64))
+    words = np.zeros(-(-num_cells // 64), dtype = np.uint64)
+    np.bitwise_or.at(words, (cells // 64).astype(np.intp), np.uint64(1) << (cells % 64))
+    return words
+
+
+def completed_lines(line_words: np.ndarray, cell_words: np.ndarray) -> np.ndarray:
+    """ Test which lines are completed by a set of cells.
+
+    Parameters
+    ----------
+    line_words : numpy.ndarray
+        The lines, as returned by get_line_words
+    cell_words : numpy.ndarray
+        The cells, for example the stones of a player, as returned by 
+        get_cell_words
+
+    Returns
+    -------
+    numpy.ndarray :
+        A boolean array with one element per line. An element is True if
+        every cell of the line is in `cell_words`.
+
+    Examples
+    --------
+    >>> line_table = get_line_table(3, 4)
+    >>> line_words = get_line_words(line_table, 4 ** 3)
+    >>> cell_words = get_cell_words([0, 21, 42, 63, 5], 4 ** 3)
+    >>> line_table[completed_lines(line_words, cell_words)].tolist()
+    [[0, 21, 42, 63]]
+    """
+
+    return ((line_words & cell_words) == line_words).all(axis = 1)
+
+
+def _index_dtype(d: int, n: int) -> np.dtype:
+    # number of cells is n^d. If this greater than 2^31 then
+    # we use int64 to store flat cell indices 0,1,2, ...
+    return np.dtype(np.int64 if n ** d > 2 ** 31 else np.int32)
+
+
+def get_scope_index(line_table: LineTable, d: int) -> ScopeIndex:
+    """ Calculate the scope of each cell in a hypercube as a sparse index.
+
+    Parameters
+    ----------
+    line_table : numpy.ndarray
+        The lines of the hypercube, as returned by get_line_table(d, n).
+    d : int 
+        The dimension of the hypercube.
+
+    Returns
+    -------
+    ScopeIndex :
+        A compressed sparse row index with fields `indptr` and `indices`.
+        The scope of the cell with flat index c is the rows
+        indices[indptr[c]:indptr[c + 1]] of `line_table`.
+            
+    See Also
+    --------
+    get_line_table
+    get_scope
+    get_scopes
+
+    Notes
+    -----
+    The index is built in one pass by a stable sort of the cells of the
+    line table. So the lines in the scope of a cell are in increasing
+    order.
+ 
+    Examples
+    --------
+    >>> line_table = get_line_table(2, 2)
+    >>> line_table.tolist()
+    [[0, 2], [1, 3], [0, 1], [2, 3], [0, 3], [1, 2]]
+    >>> scope_index = get_scope_index(line_table, 2)
+    >>> scope_index.indptr.tolist()
+    [0, 3, 6, 9, 12]
+    >>> scope_index.indices.tolist()
+    [0, 2, 4, 1, 2, 5, 0, 3, 5, 1, 3, 4]
+    >>> line_table[get_scope(scope_index, 0)].tolist()
+    [[0, 2], [0, 1], [0, 3]]
+    """
+
+    num, n = line_table.shape
+    cells = line_table.ravel()
+    dtype = np.int64 if num > 2 ** 31 else np.int32
+
+    indptr = np.zeros(n ** d + 1, dtype = np.int64)
+    np.cumsum(np.bincount(cells, minlength = n ** d), out = indptr[1:])
+    indices = (np.argsort(cells, kind = 'stable') // n).astype(dtype)
+    return ScopeIndex(indptr, indices)
+
+
+def get_scope(scope_index: ScopeIndex, cell: int) -> np.ndarray:
+    """ Returns the lines containing a cell, from a scope index.
+
+    Parameters
+    ----------
+    scope_index : ScopeIndex
+        The scope index, as returned by get_scope_index
+    cell : int
+        The flat index of the cell
+
+    Returns
+    -------
+    numpy.ndarray :
+        A view of the line numbers (rows of the line table) in the 
+        scope of `cell`.
+
+    See Also
+    --------
+    get_scope_index
+
+    Examples
+    --------
+    >>> scope_index = get_scope_index(get_line_table(2, 3), 2)
+    >>> get_scope(scope_index, 4).tolist()
+    [1, 4, 6, 7]
+    """
+
+    return scope_index.indices[scope_index.indptr[cell]:scope_index.indptr[cell + 1]]
+
+
+def structure(d: int, n: int, compact: bool = False) -> Structure:
     """ Return a celled hypercube, its lines, and the scopes of its cells.
 
     Parameters
@@ -402,17 +1199,25 @@ def structure(d: int, n: int) -> Structure:
         The number of dimensions of the hypercube
     n : int
         The number of cells in any dimension
+    compact : bool, optional
+        Determines if the lines are returned as a list of numpy.ndarray
+        views of the hypercube, or as a line table of flat cell indices.
+        A list of views is returned by default.
  
     Returns
     -------
     tuple :
         A tuple containing the hypercube, its lines, and the scopes of
-        its cells.
+        its cells. If `compact` is True then the lines are a line table
+        and the scopes are a scope index.
             
     See Also
     --------
     get_lines
+    get_line_table
     get_scopes
+    get_scope_index
+    structure_parallel
  
     Examples
     --------
@@ -430,26 +1235,271 @@ def structure(d: int, n: int) -> Structure:
                  (0, 1): [array([0, 0]), array([0, 0]), array([0, 0])],
                  (1, 0): [array([0, 0]), array([0, 0]), array([0, 0])],
                  (1, 1): [array([0, 0]), array([0, 0]), array([0, 0])]})
+
+    With a line table, every line is checked with one fancy index
+    >>> arr, lines, scopes = structure(2, 2, compact = True)
+    >>> lines.tolist()
+    [[0, 2], [1, 3], [0, 1], [2, 3], [0, 3], [1, 2]]
+    >>> arr[0, :] = 1
+    >>> (arr.ravel()[lines] == 1).all(axis = 1).tolist()
+    [False, False, True, False, False, False]
+    >>> lines[get_scope(scopes, 0)].tolist()
+    [[0, 2], [0, 1], [0, 3]]
     """
 
-    # number of cells is n^d. If this greater than 2^31 then
-    # we use int64. This is because the the get_scopes function
-    # populates the arrays with values 0,1,2, ...
-    dtype = np.int64 if n ** d > 2 ** 31 else np.int32
-    arr = np.arange(n ** d, dtype = dtype).reshape([n] * d)
+    if compact:
+        arr = np.zeros([n] * d, dtype = _index_dtype(d, n))
+        line_table = get_line_table(d, n)
+        return (arr, line_table, get_scope_index(line_table, d))
+
+    # The get_scopes function relies on the array being populated
+    # with values 0,1,2, ...
+    arr = np.arange(n ** d, dtype = _index_dtype(d, n)).reshape([n] * d)
     lines, _ = get_lines(arr)
     scopes = get_scopes(lines, d)
     arr.fill(0)
     return (arr, lines, scopes)
 
 
-def scopes_size(scopes: Scopes) -> Counter:
+def load_structure(d: int, n: int, cache_dir: str = None) -> CompactStructure:
+    """ Return the compact structure of a hypercube from an on-disk cache.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    cache_dir : str, optional
+        The cache directory. Defaults to the HYPERCUBE_CACHE_DIR 
+        environment variable if set, otherwise ~/.cache/hypercube.
+ 
+    Returns
+    -------
+    tuple :
+        A tuple containing the hypercube, its line table, and its scope
+        index, as returned by structure(d, n, compact = True). The line 
+        table and scope index are read-only memory-mapped arrays.
+
+    See Also
+    --------
+    structure
+    save_structure
+
+    Notes
+    -----
+    If the structure is not in the cache, it is built and saved first.
+    The files are memory-mapped, so loading takes no time and processes
+    that load the same structure share its pages in the OS page cache.
+ 
+    Examples
+    --------
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as cache_dir:
+    ...     arr, lines, scopes = load_structure(2, 3, cache_dir)
+    ...     sorted(os.listdir(cache_dir))
+    ...     arr, lines, scopes = load_structure(2, 3, cache_dir)
+    ['h_2_3_v1_indices.npy', 'h_2_3_v1_indptr.npy', 'h_2_3_v1_lines.npy']
+    >>> np.array_equal(lines, get_line_table(2, 3))
+    True
+    >>> lines.flags.writeable
+    False
+    >>> scopes_size(scopes) == Counter({2: 4, 3: 4, 4: 1})
+    True
+    """
+
+    paths = _cache_paths(d, n, cache_dir)
+    if not all(os.path.exists(path) for path in paths):
+        save_structure(d, n, cache_dir)
+    
+    lines, indptr, indices = [np.load(path, mmap_mode = 'r') for path in paths]
+    arr = np.zeros([n] * d, dtype = _index_dtype(d, n))
+    return (arr, lines, ScopeIndex(indptr, indices))
+
+
+def save_structure(d: int, n: int, cache_dir: str = None) -> None:
+    """ Save the line table and scope index of a hypercube to a cache.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    cache_dir : str, optional
+        The cache directory. Defaults to the HYPERCUBE_CACHE_DIR 
+        environment variable if set, otherwise ~/.cache/hypercube.
+
+    See Also
+    --------
+    load_structure
+
+    Notes
+    -----
+    Each array is written to a temporary file that is then renamed, so
+    processes reading the cache never see a partially written file.
+    """
+
+    import tempfile
+
+    lines = get_line_table(d, n)
+    scopes = get_scope_index(lines, d)
+    paths = _cache_paths(d, n, cache_dir)
+    os.makedirs(os.path.dirname(paths[0]), exist_ok = True)
+
+    for path, arr in zip(paths, (lines, scopes.indptr, scopes.indices)):
+        fd, tmp_path = tempfile.mkstemp(suffix = '.npy', dir = os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, arr)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def _cache_paths(d: int, n: int, cache_dir: str = None) -> List[str]:
+    # paths of the line table, scope index pointers and scope index indices
+    if cache_dir is None:
+        cache_dir = os.environ.get('HYPERCUBE_CACHE_DIR', 
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'hypercube'))
+    prefix = os.path.join(cache_dir, f'h_{d}_{n}_v{CACHE_VERSION}_')
+    return [prefix + name + '.npy' for name in ('lines', 'indptr', 'indices')]
+
+
+class StructureCache:
+    """ A bounded least recently used cache of compact hypercube structures.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The budget for the total size of the cached line tables and
+        scope indices. The least recently used structures are evicted
+        to stay within the budget.
+
+    Attributes
+    ----------
+    hits : int
+        The number of calls to get that were found in the cache.
+    misses : int
+        The number of calls to get that built the structure.
+    nbytes : int
+        The total size of the cached line tables and scope indices.
+
+    See Also
+    --------
+    cached_structure
+
+    Notes
+    -----
+    The cached line tables and scope indices are made read-only, since
+    they are shared by every caller.
+
+    Examples
+    --------
+    >>> cache = StructureCache(max_bytes = 1500)
+    >>> lines, scopes = cache.get(2, 3)
+    >>> lines is cache.get(2, 3)[0]
+    True
+    >>> cache.hits, cache.misses
+    (1, 1)
+    >>> cache.nbytes
+    272
+    >>> lines, scopes = cache.get(3, 3)
+    >>> cache.keys()
+    [(3, 3)]
+    >>> lines.flags.writeable
+    False
+    """
+
+    def __init__(self, max_bytes: int = 2 ** 28) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._cache: OrderedDict = OrderedDict()
+
+    def get(self, d: int, n: int) -> Tuple[LineTable, ScopeIndex]:
+        """ Return the line table and scope index of h(d, n). """
+        key = (d, n)
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        self.misses += 1
+        lines = get_line_table(d, n)
+        scopes = get_scope_index(lines, d)
+        for arr in (lines, *scopes):
+            arr.flags.writeable = False
+
+        # a structure bigger than the whole budget is not cached
+        size = lines.nbytes + scopes.indptr.nbytes + scopes.indices.nbytes
+        if size <= self.max_bytes:
+            self._cache[key] = (lines, scopes)
+            self.nbytes += size
+            self._evict()
+        return (lines, scopes)
+
+    def keys(self) -> List[Tuple[int, int]]:
+        """ Return the (d, n) keys, from least to most recently used. """
+        return list(self._cache)
+
+    def clear(self) -> None:
+        """ Remove all structures and reset the counters. """
+        self._cache.clear()
+        self.hits = self.misses = self.nbytes = 0
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes:
+            _, (lines, scopes) = self._cache.popitem(last = False)
+            self.nbytes -= lines.nbytes + scopes.indptr.nbytes + scopes.indices.nbytes
+
+
+structure_cache = StructureCache()
+
+
+def cached_structure(d: int, n: int) -> CompactStructure:
+    """ Return a compact structure, sharing its lines and scopes via a cache.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+ 
+    Returns
+    -------
+    tuple :
+        A tuple containing a new hypercube, and the read-only line table
+        and scope index held by `structure_cache`.
+
+    See Also
+    --------
+    structure
+    StructureCache
+
+    Examples
+    --------
+    >>> arr1, lines1, scopes1 = cached_structure(2, 3)
+    >>> arr2, lines2, scopes2 = cached_structure(2, 3)
+    >>> arr1 is arr2, lines1 is lines2, scopes1 is scopes2
+    (False, True, True)
+    """
+
+    lines, scopes = structure_cache.get(d, n)
+    arr = np.zeros([n] * d, dtype = _index_dtype(d, n))
+    return (arr, lines, scopes)
+
+
+def scopes_size(scopes: Union[Scopes, ScopeIndex]) -> Counter:
     """ Calculate the different scope lengths.
 
     Parameters
     ----------
-    scopes : DefaultDict
-        Dictionary of cells (keys) and their scopes
+    scopes : Union[DefaultDict, ScopeIndex]
+        Dictionary of cells (keys) and their scopes, or a scope index
  
     Returns
     -------
@@ -459,6 +1509,7 @@ def scopes_size(scopes: Scopes) -> Counter:
     See Also
     --------
     get_scopes
+    get_scope_index
  
     Examples
     --------
@@ -466,27 +1517,172 @@ def scopes_size(scopes: Scopes) -> Counter:
     >>> scopes = structure(2, 3)[2] 
     >>> scopes_size(scopes) == Counter({2: 4, 3: 4, 4: 1})
     True
+    >>> scopes = structure(2, 3, compact = True)[2] 
+    >>> scopes_size(scopes) == Counter({2: 4, 3: 4, 4: 1})
+    True
     """
     
+    if isinstance(scopes, ScopeIndex):
+        freqs = np.bincount(np.diff(scopes.indptr))
+        return counter({int(size): int(freqs[size]) for size in np.flatnonzero(freqs)})
+
     return counter([len(scope) for scope in scopes.values()])
 
 
-def scopes_size_cells(scopes: Scopes) -> DefaultDict[int, List[Cell]]:
+def scopes_size_chunked(d: int, n: int, chunk_size: int = 2 ** 16) -> Counter:
+    """ Calculate the different scope lengths while streaming the lines.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+    chunk_size : int, optional
+        The number of lines in each chunk
+ 
+    Returns
+    -------
+    Counter :
+        Counter of scopes lengths (key) and their frequency (values).
+            
+    See Also
+    --------
+    iter_lines
+    scopes_size
+
+    Notes
+    -----
+    Neither the lines nor the scopes are held in memory. Only the scope 
+    length of each cell, an array of n^d integers, is kept.
+ 
+    Examples
+    --------
+    >>> scopes_size_chunked(2, 3, 2) == Counter({2: 4, 3: 4, 4: 1})
+    True
+    >>> scopes_size_chunked(4, 4, 100) == scopes_size(structure(4, 4)[2])
+    True
+    """
+
+    sizes = np.zeros(n ** d, dtype = np.int64)
+    for lines in iter_lines(d, n, chunk_size):
+        sizes += np.bincount(lines.ravel(), minlength = n ** d)
+
+    freqs = np.bincount(sizes)
+    return counter({int(size): int(freqs[size]) for size in np.flatnonzero(freqs)})
+
+
+def scopes_size_analytic(d: int, n: int) -> Tuple[Counter, Dict[int, Tuple[int, ...]]]:
+    """ Calculate the different scope lengths without building the structure.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+ 
+    Returns
+    -------
+    Counter :
+        Counter of scopes lengths (key) and their frequency (values).
+    dict :
+        A representative cell (value) for each scope length (key).
+            
+    See Also
+    --------
+    scopes_size
+    scopes_size_cells
+
+    Notes
+    -----
+    Let the distance of a coordinate x from the edge be y = min(x, n-1-x).
+    A line through a cell varies along a set of axes S. It contains the 
+    cell if the k-th cell of the line is the cell, for some k. Along each
+    axis of S the coordinate of the cell is then k or n - 1 - k, so every
+    axis in S has the same distance from the edge.
+
+    Group the axes of a cell by their distance from the edge, and let g be
+    the size of a group. Any non-empty subset of the group can be S. If
+    the distance is not the centre (x != n - 1 - x) then, given S, the
+    direction along each axis is fixed relative to the first, and there
+    is a single line. So the group has 
+
+        sum{s=1, s=g} gCs = 2^g - 1 
+
+    lines through the cell. If the coordinates are the centre, which 
+    occurs when n is odd, then any of the 2^(s-1) directions is a line 
+    through the cell. So the group has
+
+        sum{s=1, s=g} gCs * 2^(s-1) = (3^g - 1) / 2
+
+    lines through the cell. The scope length is the sum over the groups.
+
+    The scope length thus depends only on the group sizes (g_0, g_1, ...)
+    of the distances 0, 1, ..., (n - 1) // 2. The number of cells with 
+    these group sizes is the multinomial coefficient d! / (g_0! g_1! ...)
+    times 2^g for each group that is not the centre, since each 
+    coordinate can be near either edge. There are (d + h)C(h) group sizes,
+    where h = (n - 1) // 2, which is polynomial in d.
+
+    Examples
+    --------
+    >>> sizes, cells = scopes_size_analytic(2, 3)
+    >>> sizes == Counter({2: 4, 3: 4, 4: 1})
+    True
+    >>> cells
+    {3: (0, 0), 2: (0, 1), 4: (1, 1)}
+    >>> all(scopes_size_analytic(d, n)[0] == scopes_size(structure(d, n)[2])
+    ...     for d in range(1, 5) for n in range(2, 6))
+    True
+    >>> sizes, cells = scopes_size_analytic(3, 4)
+    >>> scopes = scopes_size_cells(structure(3, 4)[2])
+    >>> all(cell in scopes[size] for size, cell in cells.items())
+    True
+    >>> sum(scopes_size_analytic(30, 5)[0].values()) == 5 ** 30
+    True
+    """
+
+    sizes: Counter = counter()
+    cells: Dict[int, Tuple[int, ...]] = {}
+    num_dists = (n + 1) // 2
+    # the centre distance exists if n is odd
+    centre = num_dists - 1 if n % 2 else None
+
+    # the distance from the edge of each axis, in non-decreasing order
+    for dists in it.combinations_with_replacement(range(num_dists), d):
+        groups = counter(dists)
+        size = sum((3 ** g - 1) // 2 if dist == centre else 2 ** g - 1
+                   for dist, g in groups.items())
+        freq = factorial(d)
+        for dist, g in groups.items():
+            freq = freq // factorial(g) * (1 if dist == centre else 2 ** g)
+
+        sizes[size] += freq
+        cells.setdefault(size, dists)
+
+    return sizes, cells
+
+
+def scopes_size_cells(scopes: Union[Scopes, ScopeIndex]) -> \
+                      DefaultDict[int, List[Union[Cell, int]]]:
     """ Group cells by length of their scope.
 
     Parameters
     ----------
-    scopes : DefaultDict
-        Dictionary of cells (keys) and their scopes
+    scopes : Union[DefaultDict, ScopeIndex]
+        Dictionary of cells (keys) and their scopes, or a scope index
  
     Returns
     -------
     DefaultDict :
         Dictonary of scopes lengths (key) and the list of cells with scopes of that length.
+        The cells are flat indices if `scopes` is a scope index.
             
     See Also
     --------
     get_scopes
+    get_scope_index
  
     Examples
     --------
@@ -498,15 +1694,82 @@ def scopes_size_cells(scopes: Scopes) -> DefaultDict[int, List[Cell]]:
                 {2: [(1, 0), (0, 1), (2, 1), (1, 2)],
                  3: [(0, 0), (2, 0), (0, 2), (2, 2)],
                  4: [(1, 1)]})
+    >>> scopes = structure(2, 3, compact = True)[2] 
+    >>> pprint(scopes_size_cells(scopes))
+    defaultdict(<class 'list'>, {2: [1, 3, 5, 7], 3: [0, 2, 6, 8], 4: [4]})
     """
 
     scopes_size_cells: DefaultDict = defaultdict(list)
+    if isinstance(scopes, ScopeIndex):
+        sizes = np.diff(scopes.indptr)
+        cells = np.argsort(sizes, kind = 'stable')
+        bounds = np.cumsum(np.bincount(sizes))
+        for size in np.flatnonzero(np.bincount(sizes)):
+            scopes_size_cells[int(size)] = cells[bounds[size - 1]:bounds[size]].tolist()
+        return scopes_size_cells
+
     for cell, scope in scopes.items():
         scopes_size_cells[len(scope)].append(cell)
 
     return scopes_size_cells
 
 
+@lru_cache(maxsize = None)
+def get_cell_classes(d: int, n: int) -> CellClasses:
+    """ Classify the cells of a hypercube by their position relative to its edges.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+
+    Returns
+    -------
+    CellClasses :
+        A named tuple of read-only arrays over flat cell indices:
+        coords, of shape (n^d, d), the coordinates of each cell; 
+        edges, of shape (n^d,), the number of coordinates of each cell
+        that are on an edge (0 or n - 1); and faces, a boolean array of
+        shape (d, 2, n^d) where faces[axis, 0] is True for the cells
+        with coordinate 0 along axis, and faces[axis, 1] for those with 
+        coordinate n - 1.
+
+    See Also
+    --------
+    scopes_size_analytic
+
+    Notes
+    -----
+    The number of edges places a cell in a class: corners have d edges,
+    inner cells have none, and in between are the outer cells. For the 
+    4x4x4 game these are the corners (3), the outer cells on the edges of
+    the cube (2), the outer cells in the middle of a face (1), and the 
+    inner cells (0).
+
+    Examples
+    --------
+    >>> classes = get_cell_classes(2, 3)
+    >>> classes.edges.reshape(3, 3).tolist()
+    [[2, 1, 2], [1, 0, 1], [2, 1, 2]]
+    >>> np.flatnonzero(classes.edges == 2).tolist()
+    [0, 2, 6, 8]
+    >>> np.flatnonzero(classes.faces[1, 1]).tolist()
+    [2, 5, 8]
+    >>> classes = get_cell_classes(3, 4)
+    >>> np.bincount(classes.edges).tolist()
+    [8, 24, 24, 8]
+    """
+
+    coords = np.indices([n] * d).reshape(d, -1).T
+    faces = np.stack([coords.T == 0, coords.T == n - 1], axis = 1)
+    edges = faces.any(axis = 1).sum(axis = 0)
+    for arr in (coords, edges, faces):
+        arr.flags.writeable = False
+    return CellClasses(coords, edges, faces)
+
+
 def slice_ndarray(arr: np.ndarray, axes: Collection[int], 
                 inds: Collection[int]) -> np.ndarray:
     """ Returns a slice of an array. 
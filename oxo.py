@@ -0,0 +1,173 @@
+""" Command-line entry point for noughts and crosses on celled hypercubes.
+
+Usage:
+
+    python -m oxo play [-d 3] [-n 4]
+    python -m oxo selfplay [-d 3] [-n 4] [--games 100] [--seed 0]
+    python -m oxo bench run --dims 3 4 --sizes 4
+    python -m oxo solve [-d 2] [-n 3]
+
+Each command imports only the modules it uses, so short batch jobs do not
+pay for numpy, colorama or the benchmark suite unless they need them.
+The time from the start of this module until a command is ready to run,
+including its imports, is reported on stderr.
+"""
+
+
+import time
+_START = time.perf_counter()
+
+import argparse
+import sys
+from typing import Dict, Optional, Sequence
+
+
+def report_startup(quiet: bool = False) -> float:
+    """ Report the time, in seconds, since this module started. """
+    elapsed = time.perf_counter() - _START
+    if not quiet:
+        print(f'startup: {elapsed * 1e3:.1f} ms', file = sys.stderr)
+    return elapsed
+
+
+def play(args: argparse.Namespace) -> int:
+    """ Play a game between two people at the terminal. """
+    import numpy as np #type: ignore
+    import hypercube as hc
+    report_startup(args.quiet)
+
+    d, n = args.d, args.n
+    board = np.zeros(n ** d, dtype = np.int8)
+    symbols = np.array(['.', 'X', 'O'])
+    # the turn only moves on after a valid move
+    turn = 0
+    while turn < n ** d:
+        player = turn % 2 + 1
+        print('\n'.join(' '.join(row) for row in symbols[board].reshape(-1, n)))
+        try:
+            text = input(f'{symbols[player]} to move, {d} coordinates from 1 to {n} (q to quit): ')
+        except EOFError:
+            print()
+            return 0
+        if text.strip().lower() == 'q':
+            return 0
+        try:
+            coords = tuple(int(x) - 1 for x in text.replace(',', ' ').split())
+            cell = int(np.ravel_multi_index(coords, [n] * d))
+        except ValueError:
+            print('Invalid coordinates')
+            continue
+        if board[cell]:
+            print('Cell is not empty')
+            continue
+
+        board[cell] = player
+        if (board[hc.cell_scope(cell, d, n)] == player).all(axis = 1).any():
+            print(f'{symbols[player]} wins')
+            return 0
+        turn += 1
+    print('Draw')
+    return 0
+
+
+def selfplay(args: argparse.Namespace) -> int:
+    """ Play games of random moves and report the results. """
+    import numpy as np #type: ignore
+    import Board2
+    report_startup(args.quiet)
+
+    # all games are played in lock-step on a batch of boards
+    batch = Board2.BoardBatch(args.games, args.d, args.n)
+    rng = np.random.default_rng(args.seed)
+    winners = np.zeros(args.games, dtype = np.int8)
+
+    start = time.perf_counter()
+    for turn in range(args.n ** args.d):
+        # a random empty cell of each unfinished game, or -1
+        keys = rng.random(batch.cells.shape)
+        keys[batch.cells != batch.EMPTY] = -1
+        cells = np.where(winners == batch.EMPTY, keys.argmax(axis = 1), -1)
+        player = turn % 2 + 1
+        winners[batch.play(cells, player)] = player
+    elapsed = time.perf_counter() - start
+
+    results = np.bincount(winners, minlength = 3)
+    print(f'X wins: {results[1]}, O wins: {results[2]}, draws: {results[0]}')
+    print(f'{args.games / elapsed:.1f} games per second')
+    return 0
+
+
+def bench(args: argparse.Namespace) -> int:
+    """ Run the benchmark suite. """
+    import bench
+    report_startup(args.quiet)
+    return bench.main(args.args)
+
+
+def solve(args: argparse.Namespace) -> int:
+    """ Find the result of perfect play by exhaustive search. """
+    import numpy as np #type: ignore
+    import hypercube as hc
+    import symmetry
+    report_startup(args.quiet)
+
+    d, n = args.d, args.n
+    _, lines, scopes = hc.cached_structure(d, n)
+    memo: Dict[bytes, int] = {}
+
+    # value of the board for the player to move: 1 win, 0 draw, -1 loss.
+    # Symmetric positions are memoized together.
+    def negamax(board: np.ndarray, player: int) -> int:
+        key = symmetry.canonicalize(board.reshape([n] * d))[0].tobytes()
+        if key in memo:
+            return memo[key]
+
+        value = -1
+        for cell in np.flatnonzero(board == 0):
+            board[cell] = player
+            if (board[lines[hc.get_scope(scopes, cell)]] == player).all(axis = 1).any():
+                score = 1
+            elif (board == 0).any():
+                score = -negamax(board, 3 - player)
+            else:
+                score = 0
+            board[cell] = 0
+            value = max(value, score)
+            if value == 1:
+                break
+
+        memo[key] = value
+        return value
+
+    start = time.perf_counter()
+    value = negamax(np.zeros(n ** d, dtype = np.int8), 1)
+    elapsed = time.perf_counter() - start
+
+    print(f'h({d}, {n}): ' + {1: 'first player wins', 0: 'draw', -1: 'second player wins'}[value])
+    print(f'{len(memo)} positions in {elapsed:.2f} s')
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog = 'oxo', description = 'Noughts and crosses on hypercubes.')
+    parser.add_argument('-q', '--quiet', action = 'store_true', help = 'do not report the startup time')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    for name, func, d, n in [('play', play, 3, 4), ('selfplay', selfplay, 3, 4), ('solve', solve, 2, 3)]:
+        command = commands.add_parser(name, help = func.__doc__)
+        command.add_argument('-d', type = int, default = d, help = 'number of dimensions')
+        command.add_argument('-n', type = int, default = n, help = 'number of cells in any dimension')
+        command.set_defaults(func = func)
+    commands.choices['selfplay'].add_argument('--games', type = int, default = 100)
+    commands.choices['selfplay'].add_argument('--seed', type = int, default = None)
+
+    command = commands.add_parser('bench', help = bench.__doc__)
+    command.add_argument('args', nargs = argparse.REMAINDER, help = 'arguments of bench.py')
+    command.set_defaults(func = bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
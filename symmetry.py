@@ -0,0 +1,163 @@
+""" Provides the symmetries of celled hypercubes.
+
+A symmetry of a hypercube h(d, n) is a rotation or reflection that maps
+the hypercube onto itself. Any symmetry can be made by permuting the
+d axes and then reversing some of them, so there are d! * 2^d symmetries.
+This is the order of the hyperoctahedral group. For example, a square has
+8 symmetries and a cube has 48.
+
+A symmetry maps lines to lines, so two boards that are images of each
+other under a symmetry are equivalent positions.
+
+This module represents a symmetry as a permutation of the flat cell
+indices 0,1,2, ..., n^d - 1. See the hypercube module for the terms used.
+"""
+
+
+# numpy doesn't yet have type annotations
+import numpy as np #type: ignore
+import itertools as it
+from functools import lru_cache
+from math import factorial
+from typing import Tuple
+
+
+def num_symmetries(d: int) -> int:
+    """ Calculate the number of symmetries of a hypercube.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+
+    Returns
+    -------
+    int:
+        The number of symmetries of a hypercube h(d, n), for n > 1.
+
+    Notes
+    -----
+    There are d! permutations of the axes, and 2^d ways of choosing the
+    axes to reverse. Each combination is a different symmetry.
+
+    Examples
+    --------
+    >>> num_symmetries(2)
+    8
+    >>> num_symmetries(3)
+    48
+    """
+
+    return factorial(d) * 2 ** d
+
+
+@lru_cache(maxsize = None)
+def get_symmetries(d: int, n: int) -> np.ndarray:
+    """ Returns every symmetry of a hypercube as a flat index permutation.
+
+    Parameters
+    ----------
+    d : int
+        The number of dimensions of the hypercube
+    n : int
+        The number of cells in any dimension
+
+    Returns
+    -------
+    numpy.ndarray:
+        A read-only array of shape (num_symmetries(d), n^d). Row t is
+        the permutation of the flat cell indices for symmetry t. The
+        image of a board `arr` under symmetry t is
+        arr.ravel()[symmetries[t]].reshape(arr.shape).
+
+    See Also
+    --------
+    num_symmetries
+    canonicalize
+
+    Notes
+    -----
+    Symmetry t = p * 2^d + f permutes the axes by the p-th permutation
+    of itertools.permutations(range(d)) and reverses the axes in the bits
+    of f, with the first axis in the highest bit. So symmetry 0 is the
+    identity.
+
+    Examples
+    --------
+    >>> symmetries = get_symmetries(2, 2)
+    >>> symmetries.shape
+    (8, 4)
+    >>> symmetries.tolist()
+    [[0, 1, 2, 3], [1, 0, 3, 2], [2, 3, 0, 1], [3, 2, 1, 0], [0, 2, 1, 3], [1, 3, 0, 2], [2, 0, 3, 1], [3, 1, 2, 0]]
+    >>> arr = np.array([[1, 2],
+    ...                 [0, 0]])
+    >>> arr.ravel()[symmetries[4]].reshape(arr.shape)
+    array([[1, 0],
+           [2, 0]])
+    """
+
+    # coordinates of each cell, shape (n^d, d)
+    coords = np.indices([n] * d).reshape(d, -1).T
+    perms = np.array(list(it.permutations(range(d))))
+    flips = np.arange(2 ** d)[:, None] >> np.arange(d - 1, -1, -1) & 1
+    strides = n ** np.arange(d - 1, -1, -1)
+
+    # permute the axes then reverse the flipped axes,
+    # shape (d!, 2^d, n^d, d)
+    permuted = coords[:, perms].transpose(1, 0, 2)[:, None, :, :]
+    images = np.where(flips[None, :, None, :], n - 1 - permuted, permuted)
+    symmetries = (images @ strides).reshape(-1, n ** d)
+    symmetries.flags.writeable = False
+    return symmetries
+
+
+def canonicalize(arr: np.ndarray) -> Tuple[np.ndarray, int]:
+    """ Returns the canonical form of a board under the hypercube symmetries.
+
+    Parameters
+    ----------
+    arr : numpy.ndarray
+        A board of shape [n] * d
+
+    Returns
+    -------
+    numpy.ndarray:
+        The lexicographically smallest image of `arr`, comparing flat
+        cell values in order, under all symmetries.
+    int :
+        The symmetry t, of get_symmetries(d, n), that maps `arr` to its
+        canonical form. Cell c of the canonical form is cell
+        get_symmetries(d, n)[t, c] of `arr`.
+
+    See Also
+    --------
+    get_symmetries
+
+    Notes
+    -----
+    Equivalent boards have the same canonical form, so it can be used
+    as the key of opening books and transposition tables. The images
+    under all symmetries are computed with a single fancy index.
+
+    Examples
+    --------
+    >>> arr = np.array([[0, 0],
+    ...                 [2, 1]])
+    >>> canonical, t = canonicalize(arr)
+    >>> canonical
+    array([[0, 0],
+           [1, 2]])
+    >>> t
+    1
+    >>> arr = np.zeros((3, 3, 3), dtype = int)
+    >>> arr[2, 0, 1] = 1
+    >>> canonicalize(arr)[0].ravel().tolist().index(1)
+    25
+    """
+
+    d, n = arr.ndim, arr.shape[0]
+    symmetries = get_symmetries(d, n)
+    images = arr.ravel()[symmetries]
+    # lexsort uses the last key as the primary key
+    t = int(np.lexsort(images.T[::-1])[0])
+    return images[t].reshape(arr.shape), t